@@ -1,11 +1,20 @@
 from knowledge_base import DynamicKB, breeze_rule, stench_rule
-from planner import astar
+from domain_kb import Contradiction
+from environment import HEADINGS
+from wumpus_core.engine import HEADING_DELTAS
+from planner import plan_actions, plan_routes
+from probability import DEFAULT_PIT_PROB, OBSERVATIONS, wumpus_prior
+from bitboard import board, iter_bits
+from vector_rules import VECTOR_RULES, VECTORIZE_MIN_SIZE
+import heapq
 import random
+from tracing import NULL_TRACE
 
 
 class RandomWumpusAgent:
-    def __init__(self, env):
+    def __init__(self, env, trace=None):
         self.env = env
+        self.trace = trace if trace is not None else NULL_TRACE
         self.position = (0, 0)
         self.direction = "E"
         self.has_gold = False
@@ -49,12 +58,21 @@ class RandomWumpusAgent:
 
 
 class KBWumpusAgent:
-    def __init__(self, env):
+    def __init__(self, env, trace=None, kb_class=DynamicKB):
         self.plan = []
         self.env = env
-        self.kb = DynamicKB(size=env.size)
-        self.kb.add_rule(breeze_rule)
-        self.kb.add_rule(stench_rule)
+        self.trace = trace if trace is not None else NULL_TRACE
+        self.kb = kb_class(size=env.size)
+        if self.kb.uses_rules:
+            if env.size >= VECTORIZE_MIN_SIZE:
+                for rule in VECTOR_RULES:
+                    self.kb.add_rule(rule)
+            else:
+                self.kb.add_rule(breeze_rule)
+                self.kb.add_rule(stench_rule)
+        self.wumpus_left = env.num_wumpus
+        pit_prob = env.pit_prob if env.pit_prob is not None else DEFAULT_PIT_PROB
+        self.kb.use_probabilities(pit_prob, wumpus_prior(self.wumpus_left, env.size))
         self.direction = "E"
         self.position = (0, 0)
         self.visited = set()
@@ -66,55 +84,26 @@ class KBWumpusAgent:
     def perceive(self, percepts):
         x, y = self.position
         self.visited.add((x, y))
-        self.kb.assert_fact(("visited", x, y))
-        self.kb.assert_fact(("safe", x, y))
-
-        if percepts["breeze"]:
-            self.kb.assert_fact(("breeze", x, y))
-        else:
-            self.kb.assert_fact(("no_breeze", x, y))
 
         if percepts["glitter"] and not self.has_gold:
             self.glitter_detected_at = self.position
 
-        if percepts["stench"]:
-            self.kb.assert_fact(("stench", x, y))
-        else:
-            self.kb.assert_fact(("no_stench", x, y))
-
-        if ("no_breeze", x, y) in self.kb.facts and ("no_stench", x, y) in self.kb.facts:
-            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < self.env.size and 0 <= ny < self.env.size:
-                    if ("safe", nx, ny) not in self.kb.facts:
-                        self.kb.assert_fact(("safe", nx, ny))
-
         dx, dy = self._get_delta(self.direction)
-        tx, ty = self.position[0] + dx, self.position[1] + dy
 
         if self.last_action_was_shoot and percepts.get("scream", False):
-            print(f"Scream heard! Eliminating Wumpus along ({dx}, {dy})")
-            while 0 <= tx < self.env.size and 0 <= ty < self.env.size:
-                self.kb.assert_fact(("no_wumpus", tx, ty))
-                self.kb.assert_fact(("safe", tx, ty))
-                self.kb.facts.discard(("possible_wumpus", tx, ty))
-                tx += dx
-                ty += dy
-            self.kb.facts = {fact for fact in self.kb.facts if fact[0] != "possible_wumpus"}
-
+            self.trace.info("Scream heard! Eliminating Wumpus along (%d, %d)", dx, dy)
+            self.wumpus_left = self._record_shot(self.kb, x, y, dx, dy, True, self.wumpus_left)
 
         elif self.last_action_was_shoot and self.env.arrow_used:
-            print("Missed shot — sweeping and marking as safe from Wumpus.")
-            while 0 <= tx < self.env.size and 0 <= ty < self.env.size:
-                print(f"Marking ({tx},{ty}) as safe from Wumpus.")
-                self.kb.assert_fact(("no_wumpus", tx, ty))
-                self.kb.assert_fact(("safe", tx, ty))
-                self.kb.facts = {f for f in self.kb.facts if f != ("possible_wumpus", tx, ty)}
-                tx += dx
-                ty += dy
+            self.trace.info("Missed shot — sweeping and marking as safe from Wumpus.")
+            self._record_shot(self.kb, x, y, dx, dy, False, self.wumpus_left)
+
+        # After the shot is accounted for, so a stench that is gone now does
+        # not contradict the ones smelled before the kill
+        self._record_observation(self.kb, x, y, percepts["breeze"], percepts["stench"])
 
         if percepts["bump"]:
-            print(f"Bump detected at {self.position} facing {self.direction}")
+            self.trace.info("Bump detected at %s facing %s", self.position, self.direction)
             nx, ny = self.position[0] + dx, self.position[1] + dy
             if 0 <= nx < self.env.size and 0 <= ny < self.env.size:
                 self.kb.add_fact(("blocked", nx, ny))
@@ -122,14 +111,73 @@ class KBWumpusAgent:
                 self.plan.pop(0)
 
         if ("gold_here", x, y) in self.kb.facts and not self.has_gold:
-            print(f"Gold detected at {self.position}, grabbing it.")
+            self.trace.info("Gold detected at %s, grabbing it.", self.position)
             self.has_gold = True
             self.plan = []
 
         self.kb.infer()
-        print("KB Facts:", self.kb.facts)
+        self.trace.debug("KB Facts: %s", self.kb.facts)
         self.bump = False
 
+    def _record_shot(self, kb, x, y, dx, dy, hit, wumpus_left):
+        """
+        Tell kb what an arrow shot from (x, y) along (dx, dy) showed; returns
+        the number of Wumpus left. A miss clears the whole line. A hit stops
+        the arrow at the first Wumpus, so only the line up to the first cell
+        that could have held it is cleared, and only the stenches next to
+        cells the victim could have occupied are dropped. Retractions come
+        first so a DomainKB rebuilds instead of contradicting its deductions.
+        The arrow says nothing about pits.
+        """
+        b = board(kb.size)
+        line = b.ray(x, y, dx, dy)
+        cleared = line
+        if not hit:
+            kb.retract_mask("possible_wumpus", line)
+        else:
+            wumpus_left = max(0, wumpus_left - 1)
+            candidates = line & ~kb.facts.mask("no_wumpus")
+            if not wumpus_left:
+                kb.retract_all("stench")
+                kb.retract_all("possible_wumpus")
+            else:
+                stale = kb.retract_mask("stench", b.neighbours(candidates))
+                kb.retract_mask("possible_wumpus", candidates | b.neighbours(stale))
+                cleared = 0
+                tx, ty = x + dx, y + dy
+                while 0 <= tx < kb.size and 0 <= ty < kb.size:
+                    bit = 1 << b.index(tx, ty)
+                    cleared |= bit
+                    if bit & candidates:
+                        break
+                    tx, ty = tx + dx, ty + dy
+            kb.beliefs.set_priors(wumpus_prob=wumpus_prior(wumpus_left, kb.size))
+        for tx, ty in map(b.cell, iter_bits(cleared)):
+            kb.assert_fact(("no_wumpus", tx, ty))
+        return wumpus_left
+
+    def _record_observation(self, kb, x, y, breeze, stench):
+        """Assert what standing on (x, y) with these percepts tells the KB."""
+        kb.assert_fact(("visited", x, y))
+        kb.assert_fact(("safe", x, y))
+
+        if breeze:
+            kb.assert_fact(("breeze", x, y))
+        else:
+            kb.assert_fact(("no_breeze", x, y))
+
+        if stench:
+            kb.assert_fact(("stench", x, y))
+        else:
+            kb.assert_fact(("no_stench", x, y))
+
+        if ("no_breeze", x, y) in kb.facts and ("no_stench", x, y) in kb.facts:
+            for dx, dy in HEADING_DELTAS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.env.size and 0 <= ny < self.env.size:
+                    if ("safe", nx, ny) not in kb.facts:
+                        kb.assert_fact(("safe", nx, ny))
+
     def _get_delta(self, direction):
         return {
             "N": (0, 1),
@@ -142,13 +190,13 @@ class KBWumpusAgent:
 
     def _turn_left(self, dir):
         if dir not in ["N", "E", "S", "W"]:
-            print(f"Warning: Invalid direction '{dir}' during left turn. Defaulting to 'N'.")
+            self.trace.info("Warning: Invalid direction %r during left turn. Defaulting to 'N'.", dir)
             return "N"
         return {"N": "W", "W": "S", "S": "E", "E": "N"}[dir]
 
     def _turn_right(self, dir):
         if dir not in ["N", "E", "S", "W"]:
-            print(f"Warning: Invalid direction '{dir}' during right turn. Defaulting to 'N'.")
+            self.trace.info("Warning: Invalid direction %r during right turn. Defaulting to 'N'.", dir)
             return "N"
         return {"N": "E", "E": "S", "S": "W", "W": "N"}[dir]
 
@@ -160,13 +208,10 @@ class KBWumpusAgent:
         percepts = self.env.get_percepts(self.position)
 
         if percepts.get("glitter", False) and not self.has_gold:
-            print(f"Gold detected at {self.position}, grabbing it and heading home.")
+            self.trace.info("Gold detected at %s, grabbing it and heading home.", self.position)
             self.has_gold = True
 
-            home_path = self._reverse_path_home()  
-            actions_home = self._path_to_actions(home_path) if home_path else []
-
-            self.plan = ["grab"] + actions_home + ["climb"]
+            self.plan = ["grab"] + self._plan_home() + ["climb"]
 
         if self.has_gold and self.plan:
             return self.plan.pop(0)
@@ -176,72 +221,60 @@ class KBWumpusAgent:
 
         if self.glitter_detected_at and not self.has_gold:
             if self.position != self.glitter_detected_at:
-                path = astar(self.position, self.glitter_detected_at, self.kb, self.env.size)
-                if path:
-                    self.plan = path
-                    return self.get_action_towards(self.plan.pop(0))
+                route = plan_actions(self.position, self.direction, [self.glitter_detected_at],
+                                     self.kb, self.env.size)
+                if route:
+                    self.plan = route[1]
+                    return self.plan.pop(0)
             else:
                 return "grab"
 
+        return self._explore(percepts)
+
+    def _explore(self, percepts):
+        """Pick the next action while the gold has not been found yet."""
         if percepts.get("stench", False) and not self.env.arrow_used:
             dx, dy = self._get_delta(self.direction)
             tx, ty = self.position[0] + dx, self.position[1] + dy
             if 0 <= tx < self.env.size and 0 <= ty < self.env.size:
                 if ("possible_wumpus", tx, ty) in self.kb.facts:
-                    print(f"Decided to shoot at ({tx}, {ty}) due to stench!")
+                    self.trace.info("Decided to shoot at (%d, %d) due to stench!", tx, ty)
                     self.last_action_was_shoot = True
                     return "shoot"
 
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+        for dx, dy in HEADING_DELTAS:
             nx, ny = self.position[0] + dx, self.position[1] + dy
             if (0 <= nx < self.env.size and 0 <= ny < self.env.size):
-                if ("safe", nx, ny) in self.kb.facts and (nx, ny) not in self.visited:
-                    print(f"Moving to adjacent unvisited safe cell: ({nx}, {ny})")
+                if (nx, ny) in self.kb.frontier.safe_unvisited:
+                    self.trace.info("Moving to adjacent unvisited safe cell: (%d, %d)", nx, ny)
+                    self.plan = []
                     return self.get_action_towards((nx, ny))
 
         if self.plan:
-            next_move = self.plan[0]
+            if self.plan[0] == "climb" and self.position != (0, 0):
+                self.plan = self._plan_home() + ["climb"]
+            return self.plan.pop(0)
 
-            if next_move == "climb" and self.position != (0, 0):
-                self.plan = self._reverse_path_home() + ["climb"]
-                next_move = self.plan[0]
+        # One search over (cell, heading) picks the cheapest safe cell still to explore
+        route = plan_actions(self.position, self.direction, self.kb.frontier.safe_unvisited,
+                             self.kb, self.env.size)
+        if route:
+            safe_cell, self.plan = route
+            self.trace.info("Planning to explore: %s, actions: %s", safe_cell, self.plan)
+            return self.plan.pop(0)
 
-            action = self.get_action_towards(next_move)
-            if action:
-                self.plan.pop(0)
-                return action
-
-        for safe_cell in self.kb.get_safe_unvisited():
-            if safe_cell != self.position and safe_cell not in self.visited:
-                path = astar(self.position, safe_cell, self.kb, self.env.size)
-                if path:
-                    self.plan = path
-                    print(f"Planning to explore: {safe_cell}, path: {path}")
-                    return self.get_action_towards(self.plan.pop(0))
-
-        for cell in sorted(self.kb.get_safe_unvisited()):
-            if cell not in self.visited:
-                path = astar(self.position, cell, self.kb, self.env.size)
-                if path:
-                    self.plan = path
-                    print(f"[Fallback] Planning to explore: {cell}, path: {path}")
-                    return self.get_action_towards(self.plan.pop(0))
-
-        unknown_cells = [
-            (nx, ny) for nx in range(self.env.size) for ny in range(self.env.size)
-            if (nx, ny) not in self.visited
-               and ("possible_pit", nx, ny) not in self.kb.facts
-               and ("pit", nx, ny) not in self.kb.facts
-               and ("possible_wumpus", nx, ny) not in self.kb.facts
-        ]
-
-        if unknown_cells:
-            
-            target = min(unknown_cells, key=lambda c: abs(c[0] - self.position[0]) + abs(c[1] - self.position[1]))
-            path = astar(self.position, target, self.kb, self.env.size, allow_unknown=True)
-            if path:
-                self.plan = path
-                return self.get_action_towards(self.plan.pop(0))
+        # Nothing safe left: enter the unexplored cell whose route has the
+        # lowest cost, death risk from the hazard probabilities included
+        beliefs = self.kb.hazard_probabilities()
+        unknown_cells = [cell for cell in self.kb.frontier.boundary if beliefs.risk(*cell) < 1.0]
+
+        route = plan_actions(self.position, self.direction, unknown_cells, self.kb, self.env.size,
+                             allow_unknown=True)
+        if route:
+            target, self.plan = route
+            self.trace.info("[Fallback] Planning to explore unknown cell: %s (risk %.2f), actions: %s",
+                            target, beliefs.risk(*target), self.plan)
+            return self.plan.pop(0)
 
         return "wait" 
 
@@ -269,47 +302,382 @@ class KBWumpusAgent:
 
         return 'move'
 
-    def _reverse_path_home(self):
-        path = astar(self.position, (0, 0), self.kb, self.env.size, allow_unknown=False)
-        return path if path else []
-
-    def _path_to_actions(self, path):
-        """
-        Convert a sequence of positions into a list of turn/move actions.
-        """
-        actions = []
-        current_direction = self.direction
-        current_position = self.position
-
-        for next_pos in path:
-            dx = next_pos[0] - current_position[0]
-            dy = next_pos[1] - current_position[1]
-
-            # Figure out which direction we need to face
-            if dx == 1:
-                target_dir = "E"
-            elif dx == -1:
-                target_dir = "W"
-            elif dy == 1:
-                target_dir = "N"
-            elif dy == -1:
-                target_dir = "S"
-            else:
-                continue  # skip invalid
-
-            # Rotate until facing target_dir
-            while current_direction != target_dir:
-                actions.append("turn_right")
-                current_direction = self._turn_right_direction(current_direction)
-
-            # Move forward
-            actions.append("move")
-            current_position = next_pos
-
-        return actions
-
-    def _turn_right_direction(self, dir):
-        order = ["N", "E", "S", "W"]
-        return order[(order.index(dir) + 1) % 4]
-
-
+    def _plan_home(self):
+        route = plan_actions(self.position, self.direction, [(0, 0)], self.kb, self.env.size,
+                             allow_unknown=False)
+        return route[1] if route else []
+
+
+# Environment scoring used to value simulated outcomes
+GOLD_VALUE = 1010  # grab (+10) and climb out with the gold (+1000)
+DEATH_VALUE = -1000
+SHOT_COST = 10
+
+# Facts whose change since a plan was chosen sends the agent back to search
+REPLAN_ON = ("breeze", "stench", "blocked", "pit", "wumpus")
+
+# Chance below which a cell no longer counts towards the cells still to be
+# proven safe; bounds that estimate to the neighbourhood of the frontier
+MIN_REACH = 0.01
+
+
+class _OutOfBudget(Exception):
+    pass
+
+
+class _NodeBudget:
+    """
+    Work a search may still do, counted in decision nodes and planner
+    searches; a count, so results do not depend on machine speed.
+    """
+
+    __slots__ = ("left",)
+
+    def __init__(self, nodes):
+        self.left = nodes
+
+    def spend(self):
+        self.left -= 1
+        if self.left < 0:
+            raise _OutOfBudget
+
+
+def _expected_reach(sim, beliefs):
+    """
+    Expected number of unvisited cells that a cautious explorer will prove
+    safe from here: the safe cells still to visit, and each unknown cell
+    with the chance that a chain of quiet cells leads to it. Entering a cell
+    proves its unknown neighbours safe when it turns out quiet, which needs
+    the neighbour itself and (taken at the priors) the other three cells
+    around it to be hazard-free.
+    """
+    size = sim.size
+    quiet = ((1.0 - beliefs.pit_prob) * (1.0 - beliefs.wumpus_prob)) ** 3
+    pit, wumpus = beliefs.pit, beliefs.wumpus
+    visited = sim.facts.mask("visited")
+    # Cells by index y * size + x, like the fact masks
+    reach = {y * size + x: 1.0 for x, y in sim.frontier.safe_unvisited}
+    heap = [(-1.0, i) for i in reach]
+    heapq.heapify(heap)
+    while heap:
+        r, i = heapq.heappop(heap)
+        r = -r
+        if r < reach[i]:
+            continue
+        x, y = i % size, i // size
+        for dx, dy in HEADING_DELTAS:
+            nx, ny = x + dx, y + dy
+            j = ny * size + nx
+            if not (0 <= nx < size and 0 <= ny < size) or visited >> j & 1:
+                continue
+            p = r * (1.0 - pit[j]) * (1.0 - wumpus[j]) * quiet
+            if p >= MIN_REACH and p > reach.get(j, 0.0):
+                reach[j] = p
+                heapq.heappush(heap, (-p, j))
+    return sum(reach.values())
+
+
+class _Outlook:
+    """
+    What the rest of the game looks like from the root of a search. Simulated
+    moves add few safe cells, so the leaves take distances home and the
+    cells the safe ones lead on to from here instead of recomputing them.
+    """
+
+    __slots__ = ("size", "home_layers", "visited", "free", "beyond")
+
+    def __init__(self, sim, size):
+        self.size = size
+        beliefs = sim.hazard_probabilities()
+        # Masks of the cells 0, 1, 2, ... moves from (0, 0) over safe cells
+        b = board(size)
+        passable = sim.facts.mask("safe") | sim.facts.mask("visited") | 1
+        self.home_layers = []
+        layer, seen = 1, 1
+        while layer:
+            self.home_layers.append(layer)
+            layer = b.neighbours(layer) & passable & ~seen
+            seen |= layer
+        # Hazard-free cells not explored yet, the ones the gold may be in; the
+        # gold never shares a cell with a hazard and pits avoid the Wumpus
+        self.visited = sim.facts.count("visited")
+        self.free = size * size - self.visited - sum(beliefs.pit) - sum(beliefs.wumpus)
+        self.beyond = _expected_reach(sim, beliefs) - len(sim.frontier.safe_unvisited)
+
+    def home_cost(self, pos):
+        """Moves from pos back to (0, 0) over the cells that were safe at the root."""
+        b = board(self.size)
+        bit = 1 << b.index(*pos)
+        # A cell entered during the search is one move beyond a safe neighbour
+        around = b.neighbours(bit)
+        for steps, layer in enumerate(self.home_layers):
+            if layer & bit:
+                return steps
+            if layer & around:
+                return steps + 1
+        return pos[0] + pos[1]
+
+    def free_cells(self, sim):
+        # Every cell visited since the root was hazard-free and held no gold
+        return max(self.free - (sim.facts.count("visited") - self.visited), 1.0)
+
+    def find_chance(self, sim):
+        """Chance that the gold lies among the cells still to be proven safe."""
+        reach = len(sim.frontier.safe_unvisited) + self.beyond
+        return min(1.0, reach / self.free_cells(sim))
+
+
+class ExpectimaxAgent(KBWumpusAgent):
+    """
+    KBWumpusAgent whose exploration is chosen by depth-limited expectimax
+    over its belief state instead of the fixed rule order.
+
+    Each decision weighs walking to one of a few candidate cells (the
+    nearest safe ones and the least risky frontier cells), shooting along a
+    line that may hold a Wumpus and - once no cell is known safe - going
+    home to climb out. Chance nodes take death, the next breeze/stench and
+    the gold from the KB's hazard probabilities; outcomes are played out on
+    a fork of the KB with snapshot/rollback. Leaves are valued by the chance
+    that the gold lies among the cells still to be proven safe: the safe
+    cells left to visit and, as estimated at the root, those they lead on to
+    (_expected_reach). Search deepens up to MAX_DEPTH until `node_budget`
+    decision nodes and planner searches are spent - a count rather than a
+    time limit, so a seeded game plays the same on any machine - and reuses
+    values and routes from tables keyed on the belief. A plan is dropped for
+    a new search as soon as a warning, bump or hazard fact appears that it
+    was not chosen with.
+    """
+
+    MAX_DEPTH = 2
+    BRANCHING = 3
+    # Percept outcomes less likely than this are not expanded
+    MIN_OUTCOME = 0.02
+    TABLE_SIZE = 50000
+    NODE_BUDGET = 120
+
+    def __init__(self, env, trace=None, kb_class=DynamicKB, node_budget=NODE_BUDGET):
+        super().__init__(env, trace, kb_class)
+        self.node_budget = node_budget
+        self.table = {}
+        self.routes = {}
+        self.outlook = None
+        self.plan_version = None
+
+    def _explore(self, percepts):
+        if self.plan and self.kb.facts.version(*REPLAN_ON) != self.plan_version:
+            self.trace.info("New evidence since planning, searching again")
+            self.plan = []
+        if not self.plan:
+            result = self.search()
+            if result is None:
+                return super()._explore(percepts)
+            value, label, actions = result
+            self.trace.info("Expectimax chose %s (value %.1f), actions: %s", label, value, actions)
+            self.plan = list(actions)
+            self.plan_version = self.kb.facts.version(*REPLAN_ON)
+        if self.plan[0] == "climb" and self.position != (0, 0):
+            self.plan = self._plan_home() + ["climb"]
+        action = self.plan.pop(0)
+        self.last_action_was_shoot = action == "shoot"
+        return action
+
+    def search(self):
+        """(value, label, actions) of the best option found within the node budget, or None."""
+        budget = _NodeBudget(self.node_budget)
+        sim = self.kb.fork()
+        state = (self.position, HEADINGS.index(self.direction), self.env.arrow_used, self.wumpus_left)
+        self.outlook = _Outlook(sim, self.env.size)
+        best = None
+        for depth in range(1, self.MAX_DEPTH + 1):
+            try:
+                # The first ply always completes so there is a move to make
+                best = self._best_option(sim, state, depth, budget if depth > 1 else None)
+            except _OutOfBudget:
+                break
+        return best
+
+    def _value(self, sim, state, depth, budget):
+        if depth == 0:
+            return self._leaf_value(sim, state)
+        key = self._belief_key(sim, state)
+        known = self.table.get(key)
+        if known is not None and known[0] >= depth:
+            return known[1]
+        best = self._best_option(sim, state, depth, budget)
+        value = best[0] if best is not None else self._leaf_value(sim, state)
+        if len(self.table) >= self.TABLE_SIZE:
+            self.table.clear()
+        self.table[key] = (depth, value)
+        return value
+
+    def _belief_key(self, sim, state):
+        facts = sim.facts
+        return (state, sim.beliefs.wumpus_prob,
+                facts.mask("visited"), facts.mask("safe"), facts.mask("breeze"),
+                facts.mask("stench"), facts.mask("no_pit"), facts.mask("no_wumpus"))
+
+    def _best_option(self, sim, state, depth, budget):
+        if budget is not None:
+            budget.spend()
+        best = None
+        for label, actions, value_of in self._options(sim, state, budget):
+            value = value_of(depth, budget)
+            if best is None or value > best[0]:
+                best = (value, label, actions)
+        return best
+
+    def _options(self, sim, state, budget):
+        pos, heading, arrow_used, wumpus_left = state
+        size = self.env.size
+        beliefs = sim.hazard_probabilities()
+
+        # Giving up only makes sense once nothing is known safe to explore
+        if not sim.frontier.safe_unvisited:
+            home = self._routes(sim, pos, heading, [(0, 0)], False, budget).get((0, 0))
+            if home is not None:
+                actions = home[0] + ["climb"]
+                yield "climb out", actions, lambda depth, budget, cost=len(home[0]): -cost
+
+        def distance(cell):
+            return abs(cell[0] - pos[0]) + abs(cell[1] - pos[1])
+
+        safe = sorted(sim.frontier.safe_unvisited, key=lambda c: (distance(c), c))[:self.BRANCHING]
+        risky = sorted((c for c in sim.frontier.boundary if beliefs.risk(*c) < 1.0),
+                       key=lambda c: (beliefs.risk(*c), distance(c), c))[:self.BRANCHING]
+        routes = self._routes(sim, pos, heading, safe + risky, True, budget)
+        for target in safe + risky:
+            route = routes.get(target)
+            if route is not None:
+                yield (f"explore {target}", route[0],
+                       lambda depth, budget, target=target, route=route:
+                       self._explore_value(sim, state, target, route, depth, budget))
+
+        if not arrow_used and sim.facts.has("stench", *pos):
+            b = board(size)
+            for h in range(4):
+                dx, dy = HEADING_DELTAS[h]
+                line = b.ray(pos[0], pos[1], dx, dy)
+                p_miss = 1.0
+                for cx, cy in map(b.cell, iter_bits(line)):
+                    p_miss *= 1.0 - beliefs.wumpus_at(cx, cy)
+                if p_miss < 1.0:
+                    turns = _turns(heading, h)
+                    yield (f"shoot {HEADINGS[h]}", turns + ["shoot"],
+                           lambda depth, budget, h=h, p_miss=p_miss, turns=len(turns):
+                           self._shoot_value(sim, state, h, p_miss, turns, depth, budget))
+
+    def _routes(self, sim, pos, heading, targets, allow_unknown, budget):
+        # {target: (actions, cells entered, final heading)} from one planner
+        # search. Rollback moves the KB's cost version on, so routes are kept
+        # by what they were costed from
+        facts, beliefs = sim.facts, sim.beliefs
+        key = (pos, heading, frozenset(targets), allow_unknown, beliefs.pit_prob, beliefs.wumpus_prob,
+               tuple(facts.mask(p) for p in sim.COST_PREDICATES + OBSERVATIONS))
+        try:
+            return self.routes[key]
+        except KeyError:
+            pass
+        if budget is not None:
+            budget.spend()
+        routes = {}
+        found = plan_routes(pos, HEADINGS[heading], targets, sim, self.env.size, allow_unknown=allow_unknown)
+        for target, actions in found.items():
+            cells = []
+            x, y, h = pos[0], pos[1], heading
+            for action in actions:
+                if action == "turn_left":
+                    h = (h - 1) % 4
+                elif action == "turn_right":
+                    h = (h + 1) % 4
+                else:
+                    x, y = x + HEADING_DELTAS[h][0], y + HEADING_DELTAS[h][1]
+                    cells.append((x, y))
+            routes[target] = actions, cells, h
+        if len(self.routes) >= self.TABLE_SIZE:
+            self.routes.clear()
+        self.routes[key] = routes
+        return routes
+
+    def _explore_value(self, sim, state, target, route, depth, budget):
+        _, _, arrow_used, wumpus_left = state
+        actions, cells, heading = route
+        beliefs = sim.hazard_probabilities()
+        survive = 1.0
+        for cell in cells:
+            survive *= 1.0 - beliefs.risk(*cell)
+
+        # Having survived, the gold is equally likely in any hazard-free cell not explored yet
+        p_gold = 1.0 / self.outlook.free_cells(sim)
+        gold_value = GOLD_VALUE - self.outlook.home_cost(target)
+
+        p_breeze, p_stench = 1.0, 1.0
+        for dx, dy in HEADING_DELTAS:
+            nx, ny = target[0] + dx, target[1] + dy
+            if 0 <= nx < self.env.size and 0 <= ny < self.env.size:
+                p_breeze *= 1.0 - beliefs.pit_at(nx, ny)
+                p_stench *= 1.0 - beliefs.wumpus_at(nx, ny)
+        p_breeze, p_stench = 1.0 - p_breeze, 1.0 - p_stench
+
+        future = 0.0
+        mass = 0.0
+        next_state = (target, heading, arrow_used, wumpus_left)
+        for breeze, pb in ((True, p_breeze), (False, 1.0 - p_breeze)):
+            for stench, ps in ((True, p_stench), (False, 1.0 - p_stench)):
+                p = pb * ps
+                if p < self.MIN_OUTCOME:
+                    continue
+                snapshot = sim.snapshot()
+                try:
+                    self._record_observation(sim, target[0], target[1], breeze, stench)
+                    sim.infer()
+                except Contradiction:
+                    # The KB rules this outcome out even if the probabilities do not
+                    sim.rollback(snapshot)
+                    continue
+                future += p * self._value(sim, next_state, depth - 1, budget)
+                sim.rollback(snapshot)
+                mass += p
+        if mass:
+            future /= mass
+
+        alive = p_gold * gold_value + (1.0 - p_gold) * future
+        return -len(actions) + (1.0 - survive) * DEATH_VALUE + survive * alive
+
+    def _shoot_value(self, sim, state, heading, p_miss, turns, depth, budget):
+        pos, _, _, wumpus_left = state
+        dx, dy = HEADING_DELTAS[heading]
+        outcomes = 0.0
+        mass = 0.0
+        for hit, p in ((True, 1.0 - p_miss), (False, p_miss)):
+            if p < self.MIN_OUTCOME:
+                continue
+            snapshot = sim.snapshot()
+            try:
+                left = self._record_shot(sim, pos[0], pos[1], dx, dy, hit, wumpus_left)
+                sim.infer()
+            except Contradiction:
+                sim.rollback(snapshot)
+                continue
+            outcomes += p * self._value(sim, (pos, heading, True, left), depth - 1, budget)
+            sim.rollback(snapshot)
+            mass += p
+        if mass:
+            outcomes /= mass
+        return -turns - SHOT_COST + outcomes
+
+    def _leaf_value(self, sim, state):
+        # Bet on the gold being among the cells still to be proven safe, and
+        # give up instead only when nothing safe is left to explore
+        home_cost = self.outlook.home_cost(state[0])
+        hopeful = self.outlook.find_chance(sim) * (GOLD_VALUE - home_cost) - home_cost
+        if sim.frontier.safe_unvisited:
+            return hopeful
+        return max(-home_cost, hopeful)
+
+
+def _turns(heading, target):
+    """Shortest turn_left/turn_right sequence from one heading index to another."""
+    right = (target - heading) % 4
+    if right == 3:
+        return ["turn_left"]
+    return ["turn_right"] * right
@@ -0,0 +1,161 @@
+import argparse
+import multiprocessing
+import random
+from collections import Counter
+from functools import partial
+
+from environment import Environment
+from agent import ExpectimaxAgent, KBWumpusAgent, RandomWumpusAgent
+from domain_kb import DomainKB
+from oracle import fraction_of_optimal, solve_seed
+
+AGENTS = {
+    "kb": KBWumpusAgent,
+    "kb-domains": partial(KBWumpusAgent, kb_class=DomainKB),
+    "expectimax": ExpectimaxAgent,
+    "expectimax-domains": partial(ExpectimaxAgent, kb_class=DomainKB),
+    "random": RandomWumpusAgent,
+}
+
+
+def run_episode(seed, agent="kb", size=4, num_wumpus=1, pit_prob=0.2, max_steps=50,
+                solvable_only=False, optimal=False):
+    """
+    Play one headless episode whose world and agent randomness come from seed.
+    Returns a plain dict so it can travel back from a worker process.
+    Environment and agent run with the default quiet trace.
+    With solvable_only, worlds whose gold cannot be brought back are not
+    played and come back with skipped=True.
+    The oracle only runs when optimal or solvable_only asks for it; otherwise
+    solvable, optimal and fraction come back as None.
+    """
+    solution = solve_seed(seed, size, num_wumpus, pit_prob) if optimal or solvable_only else None
+    if solvable_only and not solution.solvable:
+        return {"seed": seed, "skipped": True, "solvable": False, "optimal": solution.optimal_score}
+
+    random.seed(seed)
+    env = Environment(size=size, num_wumpus=num_wumpus, pit_prob=pit_prob)
+    player = AGENTS[agent](env)
+
+    steps = 0
+    while not player.done and steps < max_steps:
+        percepts = env.get_percepts(player.position, bump=getattr(player, "bump", False))
+        player.perceive(percepts)
+        action = player.choose_action()
+        env.apply_action(player, action)
+        steps += 1
+
+    won = player.done and env.death_cause is None and player.has_gold and player.position == (0, 0)
+    return {
+        "seed": seed,
+        "score": env.score,
+        "steps": steps,
+        "won": won,
+        "death": env.death_cause,
+        "timeout": not player.done,
+        "skipped": False,
+        "solvable": solution.solvable if solution else None,
+        "optimal": solution.optimal_score if solution else None,
+        "fraction": fraction_of_optimal(env.score, solution) if solution else None,
+    }
+
+
+class BatchStats:
+    """Running aggregate of episode results."""
+
+    def __init__(self):
+        self.results = 0
+        self.episodes = 0
+        self.wins = 0
+        self.timeouts = 0
+        self.total_score = 0
+        self.total_steps = 0
+        self.deaths = Counter()
+        self.skipped = 0
+        self.unsolvable = 0
+        self.scored = 0
+        self.total_fraction = 0.0
+
+    def add(self, result):
+        self.results += 1
+        if result["skipped"]:
+            self.skipped += 1
+            return
+        self.episodes += 1
+        self.wins += result["won"]
+        self.timeouts += result["timeout"]
+        self.total_score += result["score"]
+        self.total_steps += result["steps"]
+        if result["death"]:
+            self.deaths[result["death"]] += 1
+        if result["solvable"] is False:
+            self.unsolvable += 1
+        if result["fraction"] is not None:
+            self.scored += 1
+            self.total_fraction += result["fraction"]
+
+    def summary(self):
+        n = max(self.episodes, 1)
+        return {
+            "episodes": self.episodes,
+            "win_rate": self.wins / n,
+            "mean_score": self.total_score / n,
+            "mean_steps": self.total_steps / n,
+            "timeouts": self.timeouts,
+            "deaths": dict(self.deaths),
+            "skipped": self.skipped,
+            "unsolvable": self.unsolvable,
+            # Mean of score / optimal score over the worlds that can be won
+            "fraction_of_optimal": self.total_fraction / self.scored if self.scored else None,
+        }
+
+
+def run_batch(episodes, seed=0, processes=None, chunksize=16, **episode_kwargs):
+    """
+    Run `episodes` episodes with seeds seed, seed + 1, ... across a process pool
+    and yield each result as soon as its worker finishes (completion order).
+    processes=1 runs everything in the calling process.
+    """
+    seeds = range(seed, seed + episodes)
+    play = partial(run_episode, **episode_kwargs)
+    if processes == 1:
+        for s in seeds:
+            yield play(s)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(play, seeds, chunksize=chunksize):
+            yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch evaluation of Wumpus World agents")
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="kb")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--wumpus", type=int, default=1)
+    parser.add_argument("--pit-prob", type=float, default=0.2)
+    parser.add_argument("--max-steps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--solvable-only", action="store_true",
+                        help="skip worlds whose gold cannot be brought back safely")
+    parser.add_argument("--optimal", action="store_true",
+                        help="solve every world to report the fraction of the optimal score")
+    parser.add_argument("--report-every", type=int, default=0,
+                        help="print running totals every N finished episodes (0 = only at the end)")
+    args = parser.parse_args()
+
+    stats = BatchStats()
+    results = run_batch(args.episodes, seed=args.seed, processes=args.processes,
+                        agent=args.agent, size=args.size, num_wumpus=args.wumpus,
+                        pit_prob=args.pit_prob, max_steps=args.max_steps,
+                        solvable_only=args.solvable_only, optimal=args.optimal)
+    for result in results:
+        stats.add(result)
+        if args.report_every and stats.results % args.report_every == 0:
+            print(stats.summary())
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from functools import lru_cache
+
+
+def iter_bits(mask):
+    """Yield the indices of the set bits of ``mask``, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Bitboard:
+    """Whole-grid operations on integer bitsets where cell (x, y) is bit y * size + x."""
+
+    def __init__(self, size):
+        self.size = size
+        self.full = (1 << (size * size)) - 1
+        column = sum(1 << (y * size) for y in range(size))
+        self.not_first_col = self.full & ~column
+        self.not_last_col = self.full & ~(column << (size - 1))
+
+    def index(self, x, y):
+        return y * self.size + x
+
+    def cell(self, i):
+        return i % self.size, i // self.size
+
+    def shift(self, mask, dx, dy):
+        """Move every set cell by (dx, dy), dropping cells that fall off the grid."""
+        if dx == 1:
+            mask = (mask << 1) & self.not_first_col
+        elif dx == -1:
+            mask = (mask >> 1) & self.not_last_col
+        if dy == 1:
+            mask = (mask << self.size) & self.full
+        elif dy == -1:
+            mask >>= self.size
+        return mask
+
+    def ray(self, x, y, dx, dy):
+        """Cells from (x + dx, y + dy) to the edge of the grid along (dx, dy)."""
+        mask = 0
+        x, y = x + dx, y + dy
+        while 0 <= x < self.size and 0 <= y < self.size:
+            mask |= 1 << (y * self.size + x)
+            x, y = x + dx, y + dy
+        return mask
+
+    def neighbours(self, mask):
+        """Cells 4-adjacent to at least one set cell (the cells themselves excluded unless adjacent)."""
+        size = self.size
+        return (((mask << 1) & self.not_first_col)
+                | ((mask >> 1) & self.not_last_col)
+                | ((mask << size) & self.full)
+                | (mask >> size))
+
+
+@lru_cache(maxsize=None)
+def board(size):
+    return Bitboard(size)
@@ -0,0 +1,205 @@
+from collections import deque
+
+from bitboard import board, iter_bits
+from knowledge_base import DynamicKB, NEIGHBOURS
+
+# Per-cell domain bits: what a cell may still hold
+PIT = 1
+WUMPUS = 2
+EMPTY = 4
+ANY = PIT | WUMPUS | EMPTY
+
+# Observed warning -> hazard it needs in at least one neighbour, and the reverse
+WARNINGS = {"breeze": PIT, "stench": WUMPUS}
+QUIET = {"no_breeze": PIT, "no_stench": WUMPUS}
+# Facts that narrow a cell's own domain. "safe" is left out: the agent also
+# uses it loosely, so only these hazard-specific facts count as evidence
+CLEARS = {"visited": PIT | WUMPUS, "no_pit": PIT, "no_wumpus": WUMPUS}
+EVIDENCE = frozenset(WARNINGS) | frozenset(QUIET) | frozenset(CLEARS)
+# Facts written back from the domains for the planner and the agent
+DERIVED = ("no_pit", "no_wumpus", "safe", "pit", "wumpus", "possible_pit", "possible_wumpus")
+
+
+class Contradiction(ValueError):
+    """Evidence ruled out every value of a cell's domain."""
+
+
+class DomainKB(DynamicKB):
+    """
+    KB that keeps a {pit, wumpus, empty} bit-domain per cell instead of
+    deriving tuples with rules.
+
+    Visited/safe/no_pit/no_wumpus facts and no_breeze/no_stench observations
+    remove values from domains directly; every breeze/stench is an "at least
+    one neighbour" constraint. infer() drains a queue of constraints whose
+    neighbours changed, so the work done is proportional to what changed;
+    a constraint left with a single candidate pins that cell to the hazard.
+    The domains are written back as ordinary facts (DERIVED) into self.facts,
+    so the planner, get_safe_unvisited() and hazard probabilities work as with
+    DynamicKB. Retracting an observation rebuilds the domains from the facts
+    at the next infer(); facts asserted meanwhile are folded in then, so a
+    change in the world (a Wumpus shot) is made by retracting the warnings it
+    explains before asserting what replaces them. Evidence that empties a
+    domain raises Contradiction.
+    """
+
+    uses_rules = False
+
+    def __init__(self, size=4, incremental=True):
+        super().__init__(size, incremental)
+        self.domains = bytearray([ANY]) * (size * size)
+        self._queue = deque()
+        self._queued = set()
+        self._stale = False
+
+    def assert_fact(self, fact):
+        if self.facts.add(fact):
+            self._changed(fact)
+            if not self._stale:
+                self._observe(fact)
+
+    def retract_fact(self, fact):
+        if self.facts.discard(fact):
+            self._changed(fact)
+            if fact[0] in EVIDENCE:
+                self._stale = True
+
+    def retract_mask(self, pred, mask):
+        removed = super().retract_mask(pred, mask)
+        if removed and pred in EVIDENCE:
+            self._stale = True
+        return removed
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot["domains"] = bytes(self.domains)
+        snapshot["queue"] = tuple(self._queue)
+        snapshot["stale"] = self._stale
+        return snapshot
+
+    def rollback(self, snapshot):
+        super().rollback(snapshot)
+        self.domains = bytearray(snapshot["domains"])
+        self._queue = deque(snapshot["queue"])
+        self._queued = set(snapshot["queue"])
+        self._stale = snapshot["stale"]
+
+    def infer(self):
+        if self._stale:
+            self._rebuild()
+        self._propagate()
+        super().infer()
+
+    def domain(self, x, y):
+        return self.domains[y * self.size + x]
+
+    def _observe(self, fact):
+        pred, x, y = fact
+        i = y * self.size + x
+        if pred in CLEARS:
+            self._remove(i, CLEARS[pred])
+        elif pred in QUIET:
+            for n in self._neighbours(i):
+                self._remove(n, QUIET[pred])
+        elif pred in WARNINGS:
+            self._enqueue(i, WARNINGS[pred])
+            for n in self._neighbours(i):
+                self._project(n)
+
+    def _neighbours(self, i):
+        size = self.size
+        x, y = i % size, i // size
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size:
+                yield ny * size + nx
+
+    def _remove(self, i, values):
+        domain = self.domains[i]
+        narrowed = domain & ~values
+        if not narrowed:
+            size = self.size
+            raise Contradiction(f"no value left for cell ({i % size}, {i // size}), domain {domain}")
+        if narrowed != domain:
+            self._set(i, narrowed)
+
+    def _set(self, i, domain):
+        self.domains[i] = domain
+        # Re-check every warning next to the cell, then publish the new facts
+        for n in self._neighbours(i):
+            for pred, hazard in WARNINGS.items():
+                if self.facts.has(pred, n % self.size, n // self.size):
+                    self._enqueue(n, hazard)
+        self._project(i)
+
+    def _enqueue(self, i, hazard):
+        if (i, hazard) not in self._queued:
+            self._queued.add((i, hazard))
+            self._queue.append((i, hazard))
+
+    def _propagate(self):
+        domains = self.domains
+        while self._queue:
+            i, hazard = self._queue.popleft()
+            self._queued.discard((i, hazard))
+            candidates = [n for n in self._neighbours(i) if domains[n] & hazard]
+            # No candidate means a stale warning; several means nothing to deduce yet
+            if len(candidates) == 1 and domains[candidates[0]] != hazard:
+                self._set(candidates[0], hazard)
+
+    def _project(self, i):
+        size, facts, domain = self.size, self.facts, self.domains[i]
+        x, y = i % size, i // size
+        near = 0
+        for n in self._neighbours(i):
+            near |= 1 << n
+        derived = {
+            "no_pit": not domain & PIT,
+            "no_wumpus": not domain & WUMPUS,
+            "safe": domain == EMPTY,
+            "pit": domain == PIT,
+            "wumpus": domain == WUMPUS,
+            "possible_pit": bool(domain & PIT and near & facts.mask("breeze")),
+            "possible_wumpus": bool(domain & WUMPUS and near & facts.mask("stench")),
+        }
+        for pred, holds in derived.items():
+            if holds:
+                DynamicKB.assert_fact(self, (pred, x, y))
+            else:
+                DynamicKB.retract_fact(self, (pred, x, y))
+
+    def _rebuild(self):
+        # Replaying the evidence only takes PIT/WUMPUS out of domains, so up
+        # to propagation the domains and DERIVED facts follow from the fact
+        # masks; only cells that changed are written back
+        self._stale = False
+        size, facts = self.size, self.facts
+        b = board(size)
+        breeze, stench = facts.mask("breeze"), facts.mask("stench")
+        visited = facts.mask("visited")
+        pit_ok = b.full & ~(visited | facts.mask("no_pit") | b.neighbours(facts.mask("no_breeze")))
+        wumpus_ok = b.full & ~(visited | facts.mask("no_wumpus") | b.neighbours(facts.mask("no_stench")))
+        domains = self.domains
+        domains[:] = bytearray([ANY]) * len(domains)
+        for i in iter_bits(b.full & ~(pit_ok & wumpus_ok)):
+            domains[i] = EMPTY | (PIT if pit_ok >> i & 1 else 0) | (WUMPUS if wumpus_ok >> i & 1 else 0)
+        derived = {
+            "no_pit": b.full & ~pit_ok,
+            "no_wumpus": b.full & ~wumpus_ok,
+            "safe": b.full & ~(pit_ok | wumpus_ok),
+            # Pinned again by _propagate() if the warnings still pin them
+            "pit": 0,
+            "wumpus": 0,
+            "possible_pit": pit_ok & b.neighbours(breeze),
+            "possible_wumpus": wumpus_ok & b.neighbours(stench),
+        }
+        for pred, mask in derived.items():
+            current = facts.mask(pred)
+            DynamicKB.retract_mask(self, pred, current & ~mask)
+            for i in iter_bits(mask & ~current):
+                DynamicKB.assert_fact(self, (pred, i % size, i // size))
+        self._queue.clear()
+        self._queued.clear()
+        for pred, hazard in WARNINGS.items():
+            for i in iter_bits(facts.mask(pred)):
+                self._enqueue(i, hazard)
@@ -1,27 +1,140 @@
+import math
+import os
 import random
+import sys
+from tracing import NULL_TRACE, DEBUG
+
+# wumpus_core/ at the repository root is shared with the python/ engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wumpus_core.engine import (
+    WorldCore, ACTIONS, ACTION_CODES, HEADINGS, HEADING_DELTAS,
+    PERCEPT_STENCH, PERCEPT_BREEZE, PERCEPT_GLITTER, PERCEPT_BUMP, PERCEPT_SCREAM, PERCEPT_BITS,
+    encode_percepts, decode_percepts,
+    CELL_STENCH, CELL_BREEZE, CELL_GOLD, CELL_PIT, CELL_WUMPUS, CELL_WALL, CELL_PERCEPTS,
+)
 
 MOVE_COST = 1
 
+
 class Cell:
-    def __init__(self):
-        self.pit = False
-        self.wumpus = False
-        self.gold = False
-
-class Environment:
-    def __init__(self, size=4, num_wumpus=2, pit_prob=0.2):
-        self.size = size
+    """Attribute view (pit/wumpus/gold/wall) onto one byte of Environment.cells."""
+
+    __slots__ = ("_env", "_x", "_y")
+
+    def __init__(self, env, x, y):
+        self._env = env
+        self._x = x
+        self._y = y
+
+    def _flag(self, flag):
+        return bool(self._env.cells[self._x * self._env.size + self._y] & flag)
+
+    @property
+    def pit(self):
+        return self._flag(CELL_PIT)
+
+    @pit.setter
+    def pit(self, value):
+        self._env.set_pit(self._x, self._y, value)
+
+    @property
+    def wumpus(self):
+        return self._flag(CELL_WUMPUS)
+
+    @wumpus.setter
+    def wumpus(self, value):
+        self._env.set_wumpus(self._x, self._y, value)
+
+    @property
+    def gold(self):
+        return self._flag(CELL_GOLD)
+
+    @gold.setter
+    def gold(self, value):
+        self._env.set_flag(self._x, self._y, CELL_GOLD, value)
+
+    @property
+    def wall(self):
+        return self._flag(CELL_WALL)
+
+    @wall.setter
+    def wall(self, value):
+        self._env.set_flag(self._x, self._y, CELL_WALL, value)
+
+
+class _Grid:
+    """Keeps the old env.grid[x][y].<attr> access working on top of the flag array."""
+
+    __slots__ = ("_env",)
+
+    def __init__(self, env):
+        self._env = env
+
+    def __len__(self):
+        return self._env.size
+
+    def __getitem__(self, x):
+        if not 0 <= x < self._env.size:
+            raise IndexError("grid column out of range")
+        return _Column(self._env, x)
+
+
+class _Column:
+    __slots__ = ("_env", "_x")
+
+    def __init__(self, env, x):
+        self._env = env
+        self._x = x
+
+    def __len__(self):
+        return self._env.size
+
+    def __getitem__(self, y):
+        if not 0 <= y < self._env.size:
+            raise IndexError("grid row out of range")
+        return Cell(self._env, self._x, y)
+
+
+class Environment(WorldCore):
+    """
+    The KB/ front-end on top of WorldCore: agent moves, N/E/S/W headings,
+    this engine's scoring and dict percepts (or PERCEPT_* bits).
+    """
+
+    def __init__(self, size=4, num_wumpus=2, pit_prob=0.2, trace=None, cells=None):
+        super().__init__(size, cells)
+        self.trace = trace if trace is not None else NULL_TRACE
+        self.num_wumpus = num_wumpus
+        self.pit_prob = pit_prob
         self.score = 0
-        self.grid = [[Cell() for _ in range(size)] for _ in range(size)]
+        self.grid = _Grid(self)
         self.agent_position = (0, 0)
         self.agent_direction = "E"  
         self.arrow_used = False
         self.scream = False
         self.gold_found = False
-        self.place_pit_and_wumpus(num_wumpus, pit_prob)
-        self.place_gold()
+        self.death_cause = None  # "pit" or "wumpus" once the agent dies
+        if cells is None:
+            self.place_pit_and_wumpus(num_wumpus, pit_prob)
+            self.place_gold()
         self.wall = False
 
+    @classmethod
+    def from_cells(cls, cells, num_wumpus=None, pit_prob=None, trace=None):
+        """
+        Wrap an existing flag grid without copying it, e.g. one world of
+        worldgen.generate_worlds(). `cells` is any C-contiguous buffer of
+        size * size bytes laid out as [x][y] (a bytearray or a (size, size)
+        uint8 array); grabbing gold or killing a Wumpus writes back into it.
+        """
+        view = memoryview(cells).cast("B")
+        size = math.isqrt(len(view))
+        if size * size != len(view):
+            raise ValueError(f"Cell buffer of {len(view)} bytes is not a square grid")
+        if num_wumpus is None:
+            num_wumpus = sum(1 for flags in view if flags & CELL_WUMPUS)
+        return cls(size, num_wumpus, pit_prob, trace=trace, cells=view)
+
     def place_pit_and_wumpus(self, num_wumpus, pit_prob):
         candidates = [(x, y) for x in range(self.size) for y in range(self.size) if (x, y) != (0, 0)]
         random.shuffle(candidates)
@@ -29,49 +142,36 @@ class Environment:
         for _ in range(num_wumpus):
             if candidates:
                 x, y = candidates.pop()
-                self.grid[x][y].wumpus = True
+                self.set_wumpus(x, y)
 
         for x in range(self.size):
             for y in range(self.size):
-                if (x, y) != (0, 0) and not self.grid[x][y].wumpus and random.random() < pit_prob:
-                    self.grid[x][y].pit = True
+                if (x, y) != (0, 0) and not self.flags(x, y) & CELL_WUMPUS and random.random() < pit_prob:
+                    self.set_pit(x, y)
 
     def place_gold(self):
         while True:
             x = random.randint(0, self.size - 1)
             y = random.randint(0, self.size - 1)
-            if not self.grid[x][y].pit and not self.grid[x][y].wumpus and (x, y) != (0, 0):
-                self.grid[x][y].gold = True
+            if not self.flags(x, y) & (CELL_PIT | CELL_WUMPUS) and (x, y) != (0, 0):
+                self.set_flag(x, y, CELL_GOLD)
                 break
 
 
     def get_percepts(self, pos, bump=False):
-        x, y = pos
-        stench = breeze = glitter = False
-        if self.grid[x][y].gold:
-            glitter = True
-        for dx, dy in [(0, 1), (1, 0), (-1, 0), (0, -1)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.size and 0 <= ny < self.size:
-                if self.grid[nx][ny].wumpus:
-                    stench = True
-                if self.grid[nx][ny].pit:
-                    breeze = True
-        return {
-            "stench": stench,
-            "breeze": breeze,
-            "glitter": glitter,
-            "bump": bump,
-            "scream": self.scream
-        }
+        return decode_percepts(self.percept_bits(pos, bump))
+
+    def percept_bits(self, pos, bump=False):
+        """get_percepts() as a PERCEPT_* bitmask."""
+        return self.sense(pos[0], pos[1], bump, self.scream)
 
     def apply_action(self, agent, action):
         x, y = agent.position
         self.scream = False
 
         if action == "grab":
-            if self.grid[x][y].gold:
-                self.grid[x][y].gold = False
+            if self.flags(x, y) & CELL_GOLD:
+                self.set_flag(x, y, CELL_GOLD, False)
                 self.score += 10
                 agent.has_gold = True
 
@@ -113,25 +213,16 @@ class Environment:
             if self.arrow_used:
                 return
             self.arrow_used = True
-            dx, dy = self._get_delta(agent.direction)
-            tx, ty = x + dx, y + dy
-            while 0 <= tx < self.size and 0 <= ty < self.size:
-                if self.grid[tx][ty].wumpus:
-                    self.grid[tx][ty].wumpus = False
-                    self.scream = True
-                    print(f">>> Wumpus at ({tx},{ty}) has been eliminated!")
-                    break
-                tx += dx
-                ty += dy
-            
+            hit = self.first_wumpus(x, y, HEADINGS.index(agent.direction))
+            if hit is not None:
+                tx, ty = hit
+                self.set_wumpus(tx, ty, False)
+                self.scream = True
+                self.trace.info(">>> Wumpus at (%d,%d) has been eliminated!", tx, ty)
+
 
     def _get_delta(self, direction):
-        return {
-            "N": (0, 1),
-            "E": (1, 0),
-            "S": (0, -1),
-            "W": (-1, 0)
-        }[direction]
+        return HEADING_DELTAS[HEADINGS.index(direction)]
 
     def _turn_left(self, dir):
         return {"N": "W", "W": "S", "S": "E", "E": "N"}[dir]
@@ -141,40 +232,45 @@ class Environment:
 
     def check_dead(self, agent):
         x, y = agent.position
-        cell = self.grid[x][y]
-        if cell.pit:
-            print(f"Fell into pit at ({x},{y})!")
-        if cell.wumpus:
-            print(f"Killed by Wumpus at ({x},{y})!")
-        if cell.pit or cell.wumpus:
+        flags = self.flags(x, y)
+        if flags & CELL_PIT:
+            self.trace.info("Fell into pit at (%d,%d)!", x, y)
+        if flags & CELL_WUMPUS:
+            self.trace.info("Killed by Wumpus at (%d,%d)!", x, y)
+        if flags & (CELL_PIT | CELL_WUMPUS):
+            self.death_cause = "pit" if flags & CELL_PIT else "wumpus"
             self.score -= 1000
             agent.done = True
 
     def print_state(self, agent):
-        print("Map View:")
+        # The map is only drawn for DEBUG traces, so quiet runs skip building it
+        if not self.trace.enabled(DEBUG):
+            return
+        out = self.trace.sink
+        out("Map View:")
         wall_row = "# " * (self.size + 2)
-        print(wall_row)
+        out(wall_row)
         for y in range(self.size - 1, -1, -1):
             row = "# "  # left wall
             for x in range(self.size):
-                cell = self.grid[x][y]
+                flags = self.flags(x, y)
                 if (x, y) == agent.position:
                     row += "A "
-                elif cell.wumpus:
+                elif flags & CELL_WUMPUS:
                     row += "W "
-                elif cell.pit:
+                elif flags & CELL_PIT:
                     row += "P "
-                elif cell.gold:
+                elif flags & CELL_GOLD:
                     row += "G "
                 else:
                     row += ". "
             row += "#"
-            print(row)
-        print(wall_row)
+            out(row)
+        out(wall_row)
 
     def place_walls(self, positions):
         for x, y in positions:
             if (x, y) != (0, 0):  
-                self.grid[x][y].wall = True
+                self.set_flag(x, y, CELL_WALL)
 
 
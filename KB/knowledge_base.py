@@ -1,56 +1,401 @@
+import copy
+
+from bitboard import iter_bits
+from probability import FrontierModel, OBSERVATIONS
+
+NEIGHBOURS = [(0, 1), (1, 0), (-1, 0), (0, -1)]
+
+
+def triggers(*predicates):
+    """Declare which predicates re-fire a rule when incremental inference is on.
+
+    A rule tagged this way is called as ``rule(facts, size, delta)`` and only
+    has to revisit the cells touched by ``delta`` (facts added or retracted
+    since it last ran). Untagged rules keep running over the whole fact set.
+    """
+    def wrap(rule_fn):
+        rule_fn.triggers = frozenset(predicates)
+        return rule_fn
+    return wrap
+
+
+def vectorized(rule_fn):
+    """Mark a rule that works on whole-grid bitsets.
+
+    It is called as ``rule(facts, size)`` and returns ``{predicate: mask}`` of
+    conclusions for every cell at once; the KB merges whatever bits are new.
+    """
+    rule_fn.vectorized = True
+    return rule_fn
+
+
+class FactStore:
+    """Set of ``(predicate, x, y)`` facts stored as one bitset per predicate.
+
+    Cell ``(x, y)`` maps to bit ``y * size + x``. Membership, ``add`` and
+    ``discard`` keep the plain ``set`` API the agent and planner already use,
+    while ``cells(predicate)`` lists a predicate without touching the others.
+    Masks are immutable ints, so ``snapshot()`` only copies one dict entry
+    per predicate and shares every bit with the live store.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._masks = {}
+        # Per-predicate change stamps from a clock that never goes back (not
+        # even on restore), so callers can cache results derived from a predicate
+        self._versions = {}
+        self._clock = 0
+
+    def _touch(self, pred):
+        self._clock += 1
+        self._versions[pred] = self._clock
+
+    def _index(self, x, y):
+        if 0 <= x < self.size and 0 <= y < self.size:
+            return y * self.size + x
+        return -1
+
+    def add(self, fact):
+        pred, x, y = fact
+        i = self._index(x, y)
+        if i < 0:
+            raise ValueError(f"Fact {fact} lies outside the {self.size}x{self.size} grid")
+        mask = self._masks.get(pred, 0)
+        if mask >> i & 1:
+            return False
+        self._masks[pred] = mask | (1 << i)
+        self._touch(pred)
+        return True
+
+    def discard(self, fact):
+        pred, x, y = fact
+        i = self._index(x, y)
+        mask = self._masks.get(pred, 0)
+        if i < 0 or not mask >> i & 1:
+            return False
+        self._masks[pred] = mask & ~(1 << i)
+        self._touch(pred)
+        return True
+
+    def discard_mask(self, pred, mask):
+        """Remove ``pred`` from every cell set in ``mask``; returns the mask of facts actually removed."""
+        current = self._masks.get(pred, 0)
+        removed = current & mask
+        if removed:
+            self._masks[pred] = current & ~removed
+            self._touch(pred)
+        return removed
+
+    def snapshot(self):
+        return dict(self._masks)
+
+    def restore(self, snapshot):
+        for pred in set(self._masks) | set(snapshot):
+            if self._masks.get(pred, 0) != snapshot.get(pred, 0):
+                self._touch(pred)
+        self._masks = dict(snapshot)
+
+    def copy(self):
+        other = FactStore(self.size)
+        other._masks = dict(self._masks)
+        other._versions = dict(self._versions)
+        other._clock = self._clock
+        return other
+
+    def has(self, pred, x, y):
+        i = self._index(x, y)
+        return i >= 0 and self._masks.get(pred, 0) >> i & 1 == 1
+
+    def any_at(self, preds, x, y):
+        i = self._index(x, y)
+        return i >= 0 and any(self._masks.get(p, 0) >> i & 1 for p in preds)
+
+    def version(self, *preds):
+        """Counter that grows whenever a fact of one of ``preds`` is added or removed."""
+        return sum(self._versions.get(p, 0) for p in preds)
+
+    def mask(self, pred):
+        return self._masks.get(pred, 0)
+
+    def cells(self, pred):
+        size = self.size
+        for i in iter_bits(self._masks.get(pred, 0)):
+            yield i % size, i // size
+
+    def count(self, pred):
+        return self._masks.get(pred, 0).bit_count()
+
+    def predicates(self):
+        return [p for p, m in self._masks.items() if m]
+
+    def __contains__(self, fact):
+        try:
+            pred, x, y = fact
+        except (TypeError, ValueError):
+            return False
+        return self.has(pred, x, y)
+
+    def __iter__(self):
+        for pred in list(self._masks):
+            for x, y in self.cells(pred):
+                yield (pred, x, y)
+
+    def __len__(self):
+        return sum(m.bit_count() for m in self._masks.values())
+
+    def __repr__(self):
+        return "{" + ", ".join(repr(f) for f in self) + "}"
+
+
+class Frontier:
+    """
+    Exploration targets kept current as facts change: ``safe_unvisited``
+    (safe cells not visited yet) and ``boundary`` (unvisited cells next to
+    a visited one that are not known safe). Both are sets of (x, y), so
+    membership is O(1); a change only revisits the changed cell and its
+    neighbours.
+    """
+
+    TRACKED = ("safe", "visited")
+
+    def __init__(self, size):
+        self.size = size
+        self.safe_unvisited = set()
+        self.boundary = set()
+
+    def update(self, facts, fact):
+        pred, x, y = fact
+        if pred not in self.TRACKED:
+            return
+        self._refresh(facts, x, y)
+        if pred == "visited":
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.size and 0 <= ny < self.size:
+                    self._refresh(facts, nx, ny)
+
+    def _refresh(self, facts, x, y):
+        cell = (x, y)
+        visited = facts.has("visited", x, y)
+        safe = facts.has("safe", x, y)
+        if safe and not visited:
+            self.safe_unvisited.add(cell)
+        else:
+            self.safe_unvisited.discard(cell)
+        if not visited and not safe and any(
+                facts.has("visited", x + dx, y + dy) for dx, dy in NEIGHBOURS):
+            self.boundary.add(cell)
+        else:
+            self.boundary.discard(cell)
+
+    def copy(self):
+        other = Frontier(self.size)
+        other.safe_unvisited = set(self.safe_unvisited)
+        other.boundary = set(self.boundary)
+        return other
+
+    def rebuild(self, facts):
+        self.safe_unvisited.clear()
+        self.boundary.clear()
+        for x in range(self.size):
+            for y in range(self.size):
+                self._refresh(facts, x, y)
+
+
 class DynamicKB:
-    def __init__(self, size=4):
+    # Predicates the planner reads when costing a cell
+    COST_PREDICATES = ("safe", "possible_pit", "possible_wumpus", "blocked")
+    # Whether agents should register breeze/stench rules with this KB
+    uses_rules = True
+
+    def __init__(self, size=4, incremental=True):
         self.size = size
-        self.facts = set()
+        self.facts = FactStore(size)
         self.rules = []
+        self.incremental = incremental
+        # Facts added or retracted since the rules last consumed them (semi-naive delta)
+        self._log = []
+        self._cursors = {}
+        # Optional FrontierModel giving P(pit) / P(wumpus) per cell
+        self.beliefs = None
+        self.frontier = Frontier(size)
 
     def assert_fact(self, fact):
-        self.facts.add(fact)
+        if self.facts.add(fact):
+            self._changed(fact)
+
+    def retract_fact(self, fact):
+        if self.facts.discard(fact):
+            self._changed(fact)
+
+    def _changed(self, fact):
+        self._log.append(fact)
+        self.frontier.update(self.facts, fact)
+
+    def retract_mask(self, pred, mask):
+        """
+        Retract ``pred`` from every cell set in ``mask`` (bit y * size + x)
+        in place; returns the mask of facts that were actually removed.
+        """
+        removed = self.facts.discard_mask(pred, mask)
+        for i in iter_bits(removed):
+            self._changed((pred, i % self.size, i // self.size))
+        return removed
+
+    def retract_all(self, pred):
+        return self.retract_mask(pred, self.facts.mask(pred))
+
+    def snapshot(self):
+        """
+        State to hand back to rollback(). Fact masks are shared, not copied,
+        so this costs one entry per predicate plus the frontier sets.
+        """
+        return {
+            "facts": self.facts.snapshot(),
+            "log": list(self._log),
+            "cursors": dict(self._cursors),
+            "frontier": self.frontier.copy(),
+            "beliefs": copy.copy(self.beliefs),
+        }
+
+    def rollback(self, snapshot):
+        self.facts.restore(snapshot["facts"])
+        self._log = list(snapshot["log"])
+        self._cursors = dict(snapshot["cursors"])
+        self.frontier = snapshot["frontier"].copy()
+        self.beliefs = copy.copy(snapshot["beliefs"])
+
+    def fork(self):
+        """Independent KB starting from the current state, e.g. for lookahead search."""
+        clone = copy.copy(self)
+        clone.facts = self.facts.copy()
+        clone.rules = list(self.rules)
+        clone.rollback(self.snapshot())
+        return clone
 
     def add_rule(self, rule_fn):
         self.rules.append(rule_fn)
+        self._cursors[rule_fn] = None  # first run always sees the whole KB
 
     def infer(self):
+        if not self.incremental:
+            self._infer_naive()
+        else:
+            self._infer_incremental()
+        self._log.clear()
+
+    def _infer_naive(self):
         changed = True
         while changed:
             changed = False
             for rule in self.rules:
+                if getattr(rule, "vectorized", False):
+                    if self._merge(rule(self.facts, self.size)):
+                        changed = True
+                    continue
                 new_facts = rule(self.facts, self.size)
                 for f in new_facts:
                     if f not in self.facts:
-                        self.facts.add(f)
+                        self.assert_fact(f)
+                        changed = True
+
+            if self._infer_safe_combo():
+                changed = True
+
+    def _infer_incremental(self):
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.rules:
+                start = self._cursors.get(rule)
+                self._cursors[rule] = len(self._log)
+                if getattr(rule, "vectorized", False):
+                    if self._merge(rule(self.facts, self.size)):
+                        changed = True
+                    continue
+                rule_triggers = getattr(rule, "triggers", None)
+                if start is None or rule_triggers is None:
+                    new_facts = rule(self.facts, self.size)
+                else:
+                    delta = [f for f in self._log[start:] if f[0] in rule_triggers]
+                    if not delta:
+                        continue
+                    new_facts = rule(self.facts, self.size, delta)
+                for f in new_facts:
+                    if f not in self.facts:
+                        self.assert_fact(f)
                         changed = True
 
-            combo_new = set()
-            for x in range(self.size):
-                for y in range(self.size):
-                    if ("no_pit", x, y) in self.facts and ("no_wumpus", x, y) in self.facts:
-                        if ("safe", x, y) not in self.facts:
-                            combo_new.add(("safe", x, y))
-            for f in combo_new:
-                if f not in self.facts:
-                    self.facts.add(f)
-                    changed = True
+            if self._infer_safe_combo():
+                changed = True
+
+        # Every rule has now seen the whole log, so rewind the cursors with it
+        for rule in self._cursors:
+            self._cursors[rule] = 0
+
+    def cost_version(self):
+        if self.beliefs is not None:
+            return self.facts.version(*self.COST_PREDICATES, *OBSERVATIONS), self.beliefs.priors_version
+        return self.facts.version(*self.COST_PREDICATES)
+
+    def use_probabilities(self, pit_prob, wumpus_prob):
+        """Keep hazard probabilities alongside the facts; the planner then prices unknown cells by risk."""
+        self.beliefs = FrontierModel(self.size, pit_prob, wumpus_prob)
 
+    def hazard_probabilities(self):
+        """The FrontierModel brought up to date with the current facts, or None if not enabled."""
+        if self.beliefs is None:
+            return None
+        return self.beliefs.update(self.facts)
+
+    def _merge(self, conclusions):
+        added = False
+        for pred, mask in conclusions.items():
+            new = mask & ~self.facts.mask(pred)
+            for i in iter_bits(new):
+                self.assert_fact((pred, i % self.size, i // self.size))
+            added = added or new != 0
+        return added
+
+    def _infer_safe_combo(self):
+        # no_pit + no_wumpus -> safe, evaluated for the whole grid in one mask operation
+        facts = self.facts
+        combo_new = facts.mask("no_pit") & facts.mask("no_wumpus") & ~facts.mask("safe")
+        for i in iter_bits(combo_new):
+            self.assert_fact(("safe", i % self.size, i // self.size))
+        return combo_new != 0
 
     def get_safe_unvisited(self):
-        safe_unvisited = []
-        for fact in self.facts:
-            if fact[0] == "safe":
-                x, y = fact[1], fact[2]
-                if ("visited", x, y) not in self.facts:
-                    safe_unvisited.append((x, y))
-        return safe_unvisited
+        return list(self.frontier.safe_unvisited)
+
 
+def _anchor_cells(facts, size, delta, own, near):
+    """Cells a rule has to (re)evaluate: cells holding one of the `own`
+    predicates, plus - in incremental mode - cells next to a changed `near` fact."""
+    if delta is None:
+        return {cell for pred in own for cell in facts.cells(pred)}
+    cells = set()
+    for pred, x, y in delta:
+        if pred in own:
+            cells.add((x, y))
+        elif pred in near:
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size and 0 <= ny < size:
+                    cells.add((nx, ny))
+    return cells
 
-def stench_rule(facts, size):
+
+@triggers("stench", "no_stench", "no_pit", "possible_wumpus", "wumpus")
+def stench_rule(facts, size, delta=None):
     new_facts = set()
 
-    for fact in facts:
-        if fact[0] == "stench":
-            x, y = fact[1], fact[2]
+    for x, y in _anchor_cells(facts, size, delta, ("stench", "no_stench"),
+                              ("no_pit", "possible_wumpus", "wumpus")):
+        if ("stench", x, y) in facts:
             adj_unknown = []
-            for dx, dy in [(0,1), (1,0), (-1,0), (0,-1)]:
+            for dx, dy in NEIGHBOURS:
                 nx, ny = x + dx, y + dy
                 if 0 <= nx < size and 0 <= ny < size:
                     if ("no_pit", nx, ny) in facts and ("possible_wumpus", nx, ny) not in facts and (
@@ -60,9 +405,8 @@ def stench_rule(facts, size):
             if len(adj_unknown) == 1:
                 wx, wy = adj_unknown[0]
                 new_facts.add(("wumpus", wx, wy))
-        elif fact[0] == "no_stench":
-            x, y = fact[1], fact[2]
-            for dx, dy in [(0,1), (1,0), (-1,0), (0,-1)]:
+        if ("no_stench", x, y) in facts:
+            for dx, dy in NEIGHBOURS:
                 nx, ny = x + dx, y + dy
                 if 0 <= nx < size and 0 <= ny < size:
                     new_facts.add(("no_wumpus", nx, ny))
@@ -73,15 +417,15 @@ def stench_rule(facts, size):
     return new_facts
 
 
-def breeze_rule(facts, size):
+@triggers("breeze", "no_breeze", "no_pit", "possible_wumpus", "wumpus")
+def breeze_rule(facts, size, delta=None):
     new_facts = set()
-    possible_pit_candidates = []
 
-    for fact in facts:
-        if fact[0] == "breeze":
-            x, y = fact[1], fact[2]
+    for x, y in _anchor_cells(facts, size, delta, ("breeze", "no_breeze"),
+                              ("no_pit", "possible_wumpus", "wumpus")):
+        if ("breeze", x, y) in facts:
             adj_unknown = []
-            for dx, dy in [(0,1), (1,0), (-1,0), (0,-1)]:
+            for dx, dy in NEIGHBOURS:
                 nx, ny = x + dx, y + dy
                 if 0 <= nx < size and 0 <= ny < size:
                     if ("no_pit", nx, ny) in facts and ("possible_wumpus", nx, ny) not in facts and (
@@ -92,14 +436,10 @@ def breeze_rule(facts, size):
             if len(adj_unknown) == 1:
                 pit_cell = adj_unknown[0]
                 new_facts.add(("pit", pit_cell[0], pit_cell[1]))
-        elif fact[0] == "no_breeze":
-            x, y = fact[1], fact[2]
-            for dx, dy in [(0,1), (1,0), (-1,0), (0,-1)]:
+        if ("no_breeze", x, y) in facts:
+            for dx, dy in NEIGHBOURS:
                 nx, ny = x + dx, y + dy
                 if 0 <= nx < size and 0 <= ny < size:
                     new_facts.add(("no_pit", nx, ny))
                     new_facts.add(("safe", nx, ny))
     return new_facts
-
-
-
@@ -1,10 +1,13 @@
 from environment import Environment
 from agent import KBWumpusAgent
 from agent import RandomWumpusAgent
+from recorder import EpisodeRecorder
+from tracing import Trace, DEBUG
 
-def run_random_agent():
-    env = Environment(size=4, num_wumpus=1, pit_prob=0.2)
-    agent = RandomWumpusAgent(env)
+def run_random_agent(trace=None):
+    trace = trace if trace is not None else Trace(DEBUG)
+    env = Environment(size=4, num_wumpus=1, pit_prob=0.2, trace=trace)
+    agent = RandomWumpusAgent(env, trace=trace)
 
     steps = 0
     while not agent.done and steps < 50:
@@ -14,7 +17,7 @@ def run_random_agent():
         percepts["scream"] = env.scream
 
         action = agent.choose_action()
-        print(f"[Step {steps}] Action: {action}")
+        trace.info("[Step %d] Action: %s", steps, action)
 
         env.apply_action(agent, action)
         
@@ -25,14 +28,16 @@ def run_random_agent():
         steps += 1
 
 
-def run_game():
-    env = Environment(size=4, num_wumpus=1, pit_prob=0.2)
-    agent = KBWumpusAgent(env)
+def run_game(trace=None, log_path="game_log.bin"):
+    # Debug-level trace by default: every decision, the KB and the map each step
+    trace = trace if trace is not None else Trace(DEBUG)
+    env = Environment(size=4, num_wumpus=1, pit_prob=0.2, trace=trace)
+    agent = KBWumpusAgent(env, trace=trace)
 
     steps = 0
 
-    # Open the file for writing logs
-    with open("game_log.txt", "w") as log_file:
+    # Steps go to a compact binary trace; `python recorder.py game_log.bin` prints it
+    with EpisodeRecorder(log_path) as recorder:
         while not agent.done and steps < 50:
             percepts = env.get_percepts(agent.position, bump=getattr(agent, "bump", False))
             agent.perceive(percepts)
@@ -42,23 +47,19 @@ def run_game():
 
             action = agent.choose_action()
 
-            # Create the log string
-            log_str = (
-                f"[Step {steps}] Action: {action}, "
-                f"Position: {agent.position}, "
-                f"Direction: {agent.direction}, "
-                f"Has Gold: {agent.has_gold}, "
-                f"Scream: {percepts.get('scream', False)}, "
-                f"Bump: {percepts.get('bump', False)}"
+            trace.info(
+                "[Step %d] Action: %s, Position: %s, Direction: %s, Has Gold: %s, Scream: %s, Bump: %s",
+                steps, action, agent.position, agent.direction, agent.has_gold,
+                percepts.get("scream", False), percepts.get("bump", False),
             )
-
-            print(log_str)
-            log_file.write(log_str + "\n")
+            position, direction = agent.position, agent.direction
 
             env.apply_action(agent, action)
+            recorder.record(0, steps, action, position, direction, percepts, env.score,
+                            has_gold=agent.has_gold, done=agent.done)
             env.print_state(agent)
             steps += 1
 
 
 if __name__ == "__main__":
-    run_game()
\ No newline at end of file
+    run_game()
@@ -0,0 +1,149 @@
+import heapq
+import random
+from collections import namedtuple
+from functools import lru_cache
+
+from environment import Environment, CELL_GOLD, CELL_PIT, CELL_WUMPUS
+from wumpus_core.engine import HEADINGS, HEADING_DELTAS
+
+# Costs of a full-information run: per move/turn, per arrow, and the total
+# reward collected by grabbing the gold and climbing out with it
+Scoring = namedtuple("Scoring", "step shoot reward")
+# Environment.apply_action: grab +10, climb with gold +1000, grab/climb are free
+ENVIRONMENT_SCORING = Scoring(step=1, shoot=10, reward=1010)
+# WumpusWorld in python/ (see python/config.py): every action costs 1, an
+# arrow costs 10 instead, grabbing is worth 1000 and climbing out ends the game
+WUMPUS_WORLD_SCORING = Scoring(step=1, shoot=10, reward=1000 - 1 - 1)
+
+# python/ faces up/right/down/left instead of N/E/S/W
+FACINGS = {"up": "N", "right": "E", "down": "S", "left": "W"}
+
+Solution = namedtuple("Solution", "solvable optimal_score actions")
+
+
+def solve(world, scoring=None):
+    """
+    Best score an agent that sees the whole map can reach in `world`, an
+    Environment or a python/ WumpusWorld, starting from (0, 0).
+
+    Searches (cell, heading, has gold, arrow) states: moves and turns cost one
+    step, shooting kills the first Wumpus in line and opens its cell. Pits and
+    live Wumpus are never entered, and Wumpus are taken to stay put. Returns a
+    Solution whose actions are the move/turn_left/turn_right/shoot/grab/climb
+    names of Environment.apply_action, or actions=None when the gold cannot be
+    brought back; optimal_score is then 0 (give up without dying).
+    """
+    if isinstance(world, Environment):
+        size = world.size
+        pits, wumpus, gold = set(), [], None
+        for x in range(size):
+            for y in range(size):
+                flags = world.flags(x, y)
+                if flags & CELL_PIT:
+                    pits.add((x, y))
+                if flags & CELL_WUMPUS:
+                    wumpus.append((x, y))
+                if flags & CELL_GOLD and gold is None:
+                    gold = (x, y)
+        heading = HEADINGS.index("E")
+        scoring = scoring or ENVIRONMENT_SCORING
+    else:
+        size = world.size
+        pits = {(pit.pos.x, pit.pos.y) for pit in world.pits}
+        wumpus = [(w.pos.x, w.pos.y) for w in world.wumpus if w.is_alive]
+        gold = None
+        if world.gold is not None and not world.gold.is_taken:
+            gold = (world.gold.pos.x, world.gold.pos.y)
+        facing = world.player.facing if world.player is not None else "right"
+        heading = HEADINGS.index(FACINGS[facing])
+        scoring = scoring or WUMPUS_WORLD_SCORING
+
+    if gold is None:
+        return Solution(False, 0, None)
+    cost, actions = search(size, pits, wumpus, gold, heading, scoring.step, scoring.shoot)
+    if actions is None:
+        return Solution(False, 0, None)
+    return Solution(True, max(0, scoring.reward - cost), actions)
+
+
+def search(size, pits, wumpus, gold, heading=1, step=1, shoot=10):
+    """
+    Cheapest (0, 0) -> gold -> (0, 0) round trip as (cost, actions), or
+    (None, None) when there is none. `wumpus` is a list of cells; the arrow
+    state is 0 while it is unused and 1 + i once Wumpus i has been shot.
+    """
+    index = {cell: i for i, cell in enumerate(wumpus)}
+    start = (0, 0, heading, False, 0)
+    frontier = [(0, start)]
+    cost_so_far = {start: 0}
+    came_from = {start: None}
+
+    while frontier:
+        cost, state = heapq.heappop(frontier)
+        if cost > cost_so_far[state]:
+            continue
+        x, y, h, has_gold, arrow = state
+        if has_gold and (x, y) == (0, 0):
+            return cost, _actions(came_from, state)
+
+        dx, dy = HEADING_DELTAS[h]
+        edges = [("turn_left", (x, y, (h - 1) % 4, has_gold, arrow), step),
+                 ("turn_right", (x, y, (h + 1) % 4, has_gold, arrow), step)]
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < size and 0 <= ny < size and (nx, ny) not in pits:
+            i = index.get((nx, ny))
+            if i is None or arrow == i + 1:
+                edges.append(("move", (nx, ny, h, has_gold or (nx, ny) == gold, arrow), step))
+        if arrow == 0:
+            # Only a shot that kills can shorten the trip
+            tx, ty = nx, ny
+            while 0 <= tx < size and 0 <= ty < size:
+                if (tx, ty) in index:
+                    edges.append(("shoot", (x, y, h, has_gold, index[(tx, ty)] + 1), shoot))
+                    break
+                tx += dx
+                ty += dy
+
+        for action, next_state, edge_cost in edges:
+            new_cost = cost + edge_cost
+            if next_state not in cost_so_far or new_cost < cost_so_far[next_state]:
+                cost_so_far[next_state] = new_cost
+                came_from[next_state] = (state, action)
+                heapq.heappush(frontier, (new_cost, next_state))
+
+    return None, None
+
+
+def _actions(came_from, state):
+    actions = ["climb"]
+    while came_from[state] is not None:
+        previous, action = came_from[state]
+        if state[3] and not previous[3]:
+            actions.append("grab")
+        actions.append(action)
+        state = previous
+    actions.reverse()
+    return tuple(actions)
+
+
+@lru_cache(maxsize=65536)
+def solve_seed(seed, size=4, num_wumpus=1, pit_prob=0.2):
+    """
+    solve() for the Environment that random.seed(seed) produces, as in
+    batch.run_episode, memoized per world seed. The global random state is
+    left as it was.
+    """
+    state = random.getstate()
+    try:
+        random.seed(seed)
+        env = Environment(size=size, num_wumpus=num_wumpus, pit_prob=pit_prob)
+    finally:
+        random.setstate(state)
+    return solve(env)
+
+
+def fraction_of_optimal(score, solution):
+    """Score relative to the oracle's, or None for worlds with nothing to win."""
+    if not solution.solvable or solution.optimal_score <= 0:
+        return None
+    return score / solution.optimal_score
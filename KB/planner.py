@@ -1,76 +1,250 @@
 import heapq
-from environment import MOVE_COST  
+import weakref
+from collections import OrderedDict
+from environment import MOVE_COST
+from wumpus_core.engine import HEADINGS, HEADING_DELTAS
+
+TURN_COST = 1
 
 # Penalty constants
 UNKNOWN_PENALTY = 5
 DANGER_PENALTY = 50
+# Cost of certain death when the KB has hazard probabilities (Environment's -1000)
+RISK_PENALTY = 1000
+
+# Max number of paths remembered per KB
+PATH_CACHE_SIZE = 256
+
+# Cell flags in a cost grid; a cell can be safe and flagged dangerous at the same time
+CELL_SAFE = 1
+CELL_DANGER = 2
+CELL_BLOCKED = 4
+
+
+def _flag_cost(flags, allow_unknown):
+    if flags & CELL_BLOCKED:
+        return None
+    if flags & CELL_SAFE:
+        return 0
+    if not allow_unknown:
+        # Nếu là dangerous hoặc unknown khi không cho phép, bỏ qua
+        return None
+    # Dangerous => penalty rất cao
+    return DANGER_PENALTY if flags & CELL_DANGER else UNKNOWN_PENALTY
+
+
+# Extra step cost per flag combination, indexed [allow_unknown][flags]; None = impassable
+STEP_COSTS = (
+    tuple(_flag_cost(flags, False) for flags in range(8)),
+    tuple(_flag_cost(flags, True) for flags in range(8)),
+)
+
+
+class PathCache:
+    """Bounded LRU of plan_actions results plus the cost grid, valid for a single KB cost version."""
+
+    def __init__(self, maxsize=PATH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._paths = OrderedDict()
+        self.grid = None
+        self.grid_size = None
+        # Per-cell extra step costs keyed by (allow_unknown, map_size)
+        self.steps = {}
+
+    def sync(self, version):
+        # Any change to the facts the planner reads makes every stored path stale
+        if version != self.version:
+            self._paths.clear()
+            self.grid = None
+            self.steps.clear()
+            self.version = version
 
-def heuristic(a, b, kb):
-    # Khoảng cách Manhattan
-    (x1, y1) = a
-    (x2, y2) = b
-    h = abs(x1 - x2) + abs(y1 - y2)
+    def get(self, key):
+        try:
+            path = self._paths[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self._paths.move_to_end(key)
+        self.hits += 1
+        return path
 
-    # Penalty heuristic nếu ô này có nguy cơ pit
-    if ("possible_pit", x1, y1) in kb.facts or ("possible_wumpus", x1, y1) in kb.facts:
-        h += DANGER_PENALTY // 10  # chỉ tăng nhẹ heuristic, penalty chính cộng vào cost
+    def put(self, key, path):
+        self._paths[key] = path
+        self._paths.move_to_end(key)
+        if len(self._paths) > self.maxsize:
+            self._paths.popitem(last=False)
 
-    return h
+    def clear(self):
+        self._paths.clear()
+        self.grid = None
+        self.steps.clear()
+        self.version = None
 
-def astar(start, goal, kb, map_size, allow_unknown=True):
+
+_path_caches = weakref.WeakKeyDictionary()
+
+
+def path_cache(kb):
+    cache = _path_caches.get(kb)
+    if cache is None:
+        cache = _path_caches[kb] = PathCache()
+    return cache
+
+
+def cost_grid(kb, map_size):
     """
-    A* tìm đường từ start đến goal.
-    - allow_unknown=False: chỉ đi ô safe
-    - allow_unknown=True: có thể đi qua ô chưa biết (penalty)
+    One byte of CELL_* flags per cell (index y * map_size + x), rebuilt only
+    when the KB's cost version changes.
     """
-    frontier = []
-    heapq.heappush(frontier, (0, start))
-    came_from = {start: None}
-    cost_so_far = {start: 0}
+    cache = path_cache(kb)
+    cache.sync(kb.cost_version())
+    if cache.grid is None or cache.grid_size != map_size:
+        grid = bytearray(map_size * map_size)
+        for pred, flag in (("safe", CELL_SAFE), ("possible_pit", CELL_DANGER),
+                           ("possible_wumpus", CELL_DANGER), ("blocked", CELL_BLOCKED)):
+            for x, y in kb.facts.cells(pred):
+                if x < map_size and y < map_size:
+                    grid[y * map_size + x] |= flag
+        cache.grid = grid
+        cache.grid_size = map_size
+    return cache.grid
+
+
+def step_table(kb, map_size, allow_unknown):
+    """
+    Extra cost of entering each cell (index y * map_size + x), None where it
+    may not be entered. With hazard probabilities enabled on the KB, a cell
+    that is not known safe costs UNKNOWN_PENALTY plus its risk of death
+    times RISK_PENALTY instead of the flat unknown/danger penalties.
+    """
+    grid = cost_grid(kb, map_size)
+    cache = path_cache(kb)
+    key = (bool(allow_unknown), map_size)
+    steps = cache.steps.get(key)
+    if steps is None:
+        step_costs = STEP_COSTS[bool(allow_unknown)]
+        steps = [step_costs[flags] for flags in grid]
+        beliefs = kb.hazard_probabilities()
+        if beliefs is not None and allow_unknown and map_size == kb.size:
+            risk = beliefs.risk_grid()
+            for i, flags in enumerate(grid):
+                if steps[i] is not None and not flags & CELL_SAFE:
+                    steps[i] = UNKNOWN_PENALTY + round(RISK_PENALTY * risk[i])
+        cache.steps[key] = steps
+    return steps
+
+
+def plan_actions(start, heading, goals, kb, map_size, allow_unknown=True):
+    """
+    Cheapest turn_left/turn_right/move sequence from (start, heading) to any
+    cell in goals, searching over (x, y, heading) states so turns are paid for
+    where they happen. Returns (goal, actions) or None when no goal is reachable.
+    """
+    goals = frozenset(goals)
+    if not goals:
+        return None
+
+    cache = path_cache(kb)
+    cache.sync(kb.cost_version())
+    key = ("actions", start, heading, goals, allow_unknown, map_size)
+    try:
+        result = cache.get(key)
+    except KeyError:
+        result = _plan_actions_search(start, HEADINGS.index(heading), goals, kb, map_size, allow_unknown)
+        cache.put(key, result)
+    if result is None:
+        return None
+    goal, actions = result
+    return goal, list(actions)
+
+
+def plan_routes(start, heading, goals, kb, map_size, allow_unknown=True):
+    """
+    plan_actions() to every cell in goals with a single search over
+    (x, y, heading) states. Returns {goal: actions} for the goals that can
+    be reached.
+    """
+    goals = frozenset(goals)
+    if not goals:
+        return {}
+
+    cache = path_cache(kb)
+    cache.sync(kb.cost_version())
+    key = ("routes", start, heading, goals, allow_unknown, map_size)
+    try:
+        result = cache.get(key)
+    except KeyError:
+        result = _plan_routes_search(start, HEADINGS.index(heading), goals, kb, map_size, allow_unknown)
+        cache.put(key, result)
+    return {goal: list(actions) for goal, actions in result.items()}
+
+
+def _plan_actions_search(start, h0, goals, kb, map_size, allow_unknown):
+    # Manhattan distance is admissible for a single goal; several goals fall back to Dijkstra
+    single = next(iter(goals)) if len(goals) == 1 else None
+    found = _search(start, h0, goals, kb, map_size, allow_unknown, single, every_goal=False)
+    if not found:
+        return None
+    goal, actions = next(iter(found.items()))
+    return goal, actions
+
+
+def _plan_routes_search(start, h0, goals, kb, map_size, allow_unknown):
+    return _search(start, h0, goals, kb, map_size, allow_unknown, None, every_goal=True)
+
+
+def _search(start, h0, goals, kb, map_size, allow_unknown, single, every_goal):
+    # {goal: actions} for the first goal reached, or for every goal with every_goal
+    steps = step_table(kb, map_size, allow_unknown)
+
+    def estimate(x, y):
+        if single is None:
+            return 0
+        return abs(x - single[0]) + abs(y - single[1])
+
+    start_state = (start[0], start[1], h0)
+    frontier = [(estimate(*start), 0, start_state)]
+    came_from = {start_state: None}
+    cost_so_far = {start_state: 0}
+    found = {}
 
     while frontier:
-        current_priority, current = heapq.heappop(frontier)
-
-        if current == goal:
-            break
-
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            next_pos = (current[0] + dx, current[1] + dy)
-
-            # 1. Check biên bản đồ
-            if not (0 <= next_pos[0] < map_size and 0 <= next_pos[1] < map_size):
-                continue
-
-            # 2. Xác định cost extra dựa trên trạng thái KB
-            if ("safe", next_pos[0], next_pos[1]) in kb.facts:
-                extra_cost = 0
-            elif allow_unknown and not any(f[0] in ("possible_pit", "possible_wumpus") and f[1] == next_pos[0] and f[2] == next_pos[1] for f in kb.facts):
-                extra_cost = UNKNOWN_PENALTY
-            else:
-                # Nếu là dangerous hoặc unknown khi không cho phép, bỏ qua
-                if not allow_unknown:
-                    continue
-                # Dangerous => penalty rất cao
-                extra_cost = DANGER_PENALTY
-
-            # 3. Tính cost mới
-            new_cost = cost_so_far[current] + MOVE_COST + extra_cost
-
-            # 4. Cập nhật nếu tìm thấy đường rẻ hơn
-            if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
-                cost_so_far[next_pos] = new_cost
-                priority = new_cost + heuristic(next_pos, goal, kb)
-                heapq.heappush(frontier, (priority, next_pos))
-                came_from[next_pos] = current
-
-    # Truy ngược path
-    if goal not in came_from:
-        return None  # Không tìm được đường
-
-    path = []
-    current = goal
-    while current != start:
-        path.append(current)
-        current = came_from[current]
-    path.reverse()
-    return path
+        _, cost, state = heapq.heappop(frontier)
+        if cost > cost_so_far[state]:
+            continue
+        x, y, h = state
+        if (x, y) in goals and (x, y) not in found:
+            found[(x, y)] = _trace_actions(came_from, state)
+            if not every_goal or len(found) == len(goals):
+                break
+
+        edges = [("turn_left", (x, y, (h - 1) % 4), TURN_COST),
+                 ("turn_right", (x, y, (h + 1) % 4), TURN_COST)]
+        dx, dy = HEADING_DELTAS[h]
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < map_size and 0 <= ny < map_size:
+            extra_cost = steps[ny * map_size + nx]
+            if extra_cost is not None:
+                edges.append(("move", (nx, ny, h), MOVE_COST + extra_cost))
+
+        for action, next_state, step in edges:
+            new_cost = cost + step
+            if next_state not in cost_so_far or new_cost < cost_so_far[next_state]:
+                cost_so_far[next_state] = new_cost
+                came_from[next_state] = (state, action)
+                heapq.heappush(frontier, (new_cost + estimate(next_state[0], next_state[1]), new_cost, next_state))
+
+    return found
+
+
+def _trace_actions(came_from, state):
+    actions = []
+    while came_from[state] is not None:
+        state, action = came_from[state]
+        actions.append(action)
+    actions.reverse()
+    return tuple(actions)
@@ -0,0 +1,257 @@
+from collections import OrderedDict
+from itertools import count
+
+from bitboard import board, iter_bits
+
+# Used when the environment does not say how its pits were drawn
+DEFAULT_PIT_PROB = 0.2
+
+# Predicates whose changes can move a probability
+OBSERVATIONS = ("visited", "breeze", "no_breeze", "stench", "no_stench", "no_pit", "no_wumpus",
+                "pit", "wumpus")
+
+# (warning, no warning, cleared, known) predicates for each hazard
+PIT_PREDICATES = ("breeze", "no_breeze", "no_pit", "pit")
+WUMPUS_PREDICATES = ("stench", "no_stench", "no_wumpus", "wumpus")
+
+# Max number of frontier components whose counts are remembered per model
+COMPONENT_CACHE_SIZE = 512
+
+# Stamps for prior changes; shared and never reused, like FactStore versions
+_prior_stamps = count(1)
+
+
+def wumpus_prior(num_wumpus, size):
+    """Chance that a given cell other than (0, 0) holds one of num_wumpus Wumpus."""
+    cells = size * size - 1
+    return min(1.0, num_wumpus / cells) if cells > 0 else 0.0
+
+
+class ComponentCache:
+    """
+    Bounded LRU of component_marginals() results keyed by the component's
+    signature (prior, cells, constraint scopes). A move changes the
+    constraints of one component at most, so every other component is a hit.
+    """
+
+    def __init__(self, maxsize=COMPONENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._counts = OrderedDict()
+
+    def marginals(self, cells, scopes, prior):
+        key = (prior, cells, frozenset(scopes))
+        try:
+            result = self._counts[key]
+        except KeyError:
+            self.misses += 1
+            result = self._counts[key] = component_marginals(cells, scopes, prior)
+            if len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+        else:
+            self.hits += 1
+            self._counts.move_to_end(key)
+        return result
+
+    def clear(self):
+        self._counts.clear()
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class FrontierModel:
+    """
+    Exact P(pit) and P(wumpus) per cell from the observations in a FactStore.
+
+    Every cell is a pit with probability pit_prob and holds a Wumpus with
+    probability wumpus_prob, independently. A breeze (stench) says at least
+    one unexplored neighbour is a pit (Wumpus); visited cells and cells the
+    KB has cleared are hazard-free. Only cells next to a warning - the
+    frontier - move away from the prior. They are split into independent
+    components, and each component is counted exactly with a dynamic
+    program that merges partial assignments satisfying the same constraints.
+    Component results are kept in a ComponentCache across updates.
+    """
+
+    def __init__(self, size, pit_prob, wumpus_prob, cache_size=COMPONENT_CACHE_SIZE):
+        self.size = size
+        self.cache = ComponentCache(cache_size)
+        self.pit_prob = pit_prob
+        self.wumpus_prob = wumpus_prob
+        # Changes whenever the priors do, for caches keyed on DynamicKB.cost_version()
+        self.priors_version = next(_prior_stamps)
+        self.version = None
+        self.pit = None
+        self.wumpus = None
+
+    def set_priors(self, pit_prob=None, wumpus_prob=None):
+        if pit_prob is not None:
+            self.pit_prob = pit_prob
+        if wumpus_prob is not None:
+            self.wumpus_prob = wumpus_prob
+        self.priors_version = next(_prior_stamps)
+        self.version = None
+
+    def update(self, facts):
+        """Recount if the observations changed since the last call; returns self."""
+        version = facts.version(*OBSERVATIONS)
+        if version != self.version:
+            self.pit = hazard_probabilities(facts, self.size, self.pit_prob, *PIT_PREDICATES,
+                                            cache=self.cache)
+            self.wumpus = hazard_probabilities(facts, self.size, self.wumpus_prob, *WUMPUS_PREDICATES,
+                                               cache=self.cache)
+            self.version = version
+        return self
+
+    def pit_at(self, x, y):
+        return self.pit[y * self.size + x]
+
+    def wumpus_at(self, x, y):
+        return self.wumpus[y * self.size + x]
+
+    def risk(self, x, y):
+        """Probability that stepping onto (x, y) kills."""
+        i = y * self.size + x
+        return 1.0 - (1.0 - self.pit[i]) * (1.0 - self.wumpus[i])
+
+    def risk_grid(self):
+        """risk() for every cell, indexed y * size + x."""
+        return [1.0 - (1.0 - p) * (1.0 - w) for p, w in zip(self.pit, self.wumpus)]
+
+
+def hazard_probabilities(facts, size, prior, warning, no_warning, cleared, known=None, cache=None):
+    """
+    Probability of one hazard for every cell, indexed y * size + x. Cells
+    holding the `known` predicate have it for certain and explain the
+    warnings next to them. Components are looked up in `cache` (a
+    ComponentCache) when one is given.
+    """
+    b = board(size)
+    visited = facts.mask("visited")
+    quiet = facts.mask(no_warning)
+    clear = facts.mask(cleared) | visited | quiet | b.neighbours(quiet)
+    certain = facts.mask(known) & ~clear if known is not None else 0
+    unknown = b.full & ~clear & ~certain
+
+    probs = [0.0] * (size * size)
+    for i in iter_bits(unknown):
+        probs[i] = prior
+    for i in iter_bits(certain):
+        probs[i] = 1.0
+
+    scopes = set()
+    for i in iter_bits(facts.mask(warning) & ~quiet & ~b.neighbours(certain)):
+        scope = b.neighbours(1 << i) & unknown
+        # A warning with nothing left to explain it is stale (e.g. after a kill)
+        if scope:
+            scopes.add(scope)
+
+    count = cache.marginals if cache is not None else component_marginals
+    for cells, members in frontier_components(scopes):
+        for i, p in count(cells, members, prior).items():
+            probs[i] = p
+    return probs
+
+
+def frontier_components(scopes):
+    """Group constraint scopes (cell bitmasks) into [cells mask, scopes] sets that share no cell."""
+    groups = []
+    for scope in scopes:
+        cells, members = scope, [scope]
+        rest = []
+        for other_cells, other_members in groups:
+            if other_cells & cells:
+                cells |= other_cells
+                members += other_members
+            else:
+                rest.append((other_cells, other_members))
+        rest.append((cells, members))
+        groups = rest
+    return groups
+
+
+def component_marginals(cells, scopes, prior):
+    """
+    {cell index: probability} for the cells of one component, given that every
+    scope holds at least one hazard. Cells are decided one at a time; partial
+    assignments that leave the same open constraints unsatisfied are merged,
+    so the work grows with the component's width rather than 2 ** cells.
+    """
+    order = _cell_order(cells, scopes)
+    n = len(order)
+    if prior <= 0.0 or prior >= 1.0:
+        return {i: prior for i in order}
+
+    position = {cell: k for k, cell in enumerate(order)}
+    touches = [0] * n
+    closes = [0] * n
+    for c, scope in enumerate(scopes):
+        last = 0
+        for i in iter_bits(scope):
+            touches[position[i]] |= 1 << c
+            last = max(last, position[i])
+        closes[last] |= 1 << c
+    weights = ((0, 1.0 - prior), (1, prior))
+
+    def step(k, satisfied, hazard):
+        if hazard:
+            satisfied |= touches[k]
+        if closes[k] & ~satisfied:
+            return None  # a constraint ends here without a hazard
+        return satisfied & ~closes[k]
+
+    forward = [{0: 1.0}]
+    for k in range(n):
+        layer = {}
+        for satisfied, weight in forward[-1].items():
+            for hazard, p in weights:
+                key = step(k, satisfied, hazard)
+                if key is not None:
+                    layer[key] = layer.get(key, 0.0) + weight * p
+        forward.append(layer)
+    total = forward[n].get(0, 0.0)
+    if total <= 0.0:
+        return {i: prior for i in order}
+
+    backward = [None] * n + [{0: 1.0}]
+    marginals = {}
+    for k in range(n - 1, -1, -1):
+        after = backward[k + 1]
+        layer = {}
+        hazard_weight = 0.0
+        for satisfied, weight in forward[k].items():
+            completions = 0.0
+            for hazard, p in weights:
+                key = step(k, satisfied, hazard)
+                if key is not None and key in after:
+                    completions += p * after[key]
+                    if hazard:
+                        hazard_weight += weight * p * after[key]
+            layer[satisfied] = completions
+        backward[k] = layer
+        marginals[order[k]] = hazard_weight / total
+    return marginals
+
+
+def _cell_order(cells, scopes):
+    # Breadth-first through shared constraints keeps the set of open constraints small
+    neighbours = {}
+    for scope in scopes:
+        for i in iter_bits(scope):
+            neighbours[i] = neighbours.get(i, 0) | scope
+    order = []
+    seen = 0
+    for start in iter_bits(cells):
+        if seen >> start & 1:
+            continue
+        seen |= 1 << start
+        queue = [start]
+        while queue:
+            i = queue.pop(0)
+            order.append(i)
+            fresh = neighbours.get(i, 0) & ~seen
+            seen |= fresh
+            queue.extend(iter_bits(fresh))
+    return order
@@ -0,0 +1,155 @@
+import mmap
+import struct
+import sys
+from collections import namedtuple
+
+from environment import ACTIONS, ACTION_CODES, HEADINGS, decode_percepts, encode_percepts
+
+# File layout: one HEADER, then fixed-width RECORDs back to back
+MAGIC = b"WUMPTRC"
+VERSION = 1
+HEADER = struct.Struct("<7sBH")  # magic, version, record size
+# episode, step, action code, heading index, percept bits, flags, x, y, score after the action
+RECORD = struct.Struct("<IIBBBBHHi")
+
+FLAG_HAS_GOLD = 1
+FLAG_DONE = 2
+
+UNKNOWN_ACTION = 255
+
+TraceRecord = namedtuple("TraceRecord", "episode step action heading percepts flags x y score")
+
+
+def _check_header(path, header):
+    # header is the first HEADER.size bytes of the file, or fewer if it is shorter
+    if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, RECORD.size):
+        raise ValueError(f"{path} is not a version {VERSION} episode trace")
+
+
+class EpisodeRecorder:
+    """
+    Buffered writer for binary episode traces.
+
+    Steps are packed straight into a preallocated buffer and written out in
+    bulk every `buffer_records` steps (and on flush/close). With append=True
+    an existing file must already be a trace of this version.
+    """
+
+    def __init__(self, path, buffer_records=4096, append=False):
+        self.path = path
+        self._file = open(path, "a+b" if append else "wb")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        else:
+            # Writes still go to the end of the file whatever the read position
+            self._file.seek(0)
+            try:
+                _check_header(path, self._file.read(HEADER.size))
+            except ValueError:
+                self._file.close()
+                raise
+        self._buffer = bytearray(RECORD.size * buffer_records)
+        self._used = 0
+
+    def record(self, episode, step, action, position, heading, percepts, score,
+               has_gold=False, done=False):
+        """percepts may be a get_percepts() dict or an already packed bitmask."""
+        if self._used == len(self._buffer):
+            self.flush()
+        if not isinstance(percepts, int):
+            percepts = encode_percepts(percepts)
+        flags = (FLAG_HAS_GOLD if has_gold else 0) | (FLAG_DONE if done else 0)
+        RECORD.pack_into(self._buffer, self._used, episode, step,
+                         ACTION_CODES.get(action, UNKNOWN_ACTION), HEADINGS.index(heading),
+                         percepts, flags, position[0], position[1], score)
+        self._used += RECORD.size
+
+    def flush(self):
+        if self._used:
+            self._file.write(memoryview(self._buffer)[:self._used])
+            self._used = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """
+    Memory-mapped view over a trace file: random access by index, streaming
+    iteration and per-field columns, without parsing any text.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            # Before mapping, so an empty or cut-off file gets the same error
+            _check_header(path, self._file.read(HEADER.size))
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        self._count = (len(self._map) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("trace record index out of range")
+        return TraceRecord._make(RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size))
+
+    def __iter__(self):
+        body = memoryview(self._map)[HEADER.size:HEADER.size + self._count * RECORD.size]
+        try:
+            for fields in RECORD.iter_unpack(body):
+                yield TraceRecord._make(fields)
+        finally:
+            body.release()
+
+    def column(self, name):
+        """All values of one field, e.g. column("score")."""
+        i = TraceRecord._fields.index(name)
+        return [fields[i] for fields in self]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def describe(record):
+    """Human readable line for one record, in the style of the old text log."""
+    action = ACTIONS[record.action] if record.action < len(ACTIONS) else "?"
+    percepts = decode_percepts(record.percepts)
+    return (
+        f"[Episode {record.episode} Step {record.step}] Action: {action}, "
+        f"Position: ({record.x}, {record.y}), "
+        f"Direction: {HEADINGS[record.heading]}, "
+        f"Has Gold: {bool(record.flags & FLAG_HAS_GOLD)}, "
+        f"Scream: {percepts['scream']}, "
+        f"Bump: {percepts['bump']}, "
+        f"Score: {record.score}"
+    )
+
+
+if __name__ == "__main__":
+    with TraceReader(sys.argv[1] if len(sys.argv) > 1 else "game_log.bin") as reader:
+        for rec in reader:
+            print(describe(rec))
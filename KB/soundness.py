@@ -0,0 +1,75 @@
+import argparse
+import random
+
+from environment import Environment, CELL_PIT, CELL_WUMPUS
+from batch import AGENTS
+from domain_kb import Contradiction
+
+# Derived fact -> (hazard flag, whether the fact claims the hazard is there)
+CLAIMS = {
+    "pit": (CELL_PIT, True),
+    "no_pit": (CELL_PIT, False),
+    "wumpus": (CELL_WUMPUS, True),
+    "no_wumpus": (CELL_WUMPUS, False),
+    "safe": (CELL_PIT | CELL_WUMPUS, False),
+}
+
+
+def contradictions(kb, env):
+    """KB facts that the hidden world disproves, as (pred, x, y) tuples."""
+    wrong = []
+    for pred, (hazard, present) in CLAIMS.items():
+        for x, y in kb.facts.cells(pred):
+            if bool(env.flags(x, y) & hazard) != present:
+                wrong.append((pred, x, y))
+    return wrong
+
+
+def check_episode(seed, agent="kb", size=4, num_wumpus=1, pit_prob=0.2, max_steps=50):
+    """
+    Play one seeded episode as batch.run_episode does and check the agent's KB
+    against the hidden world after every percept. Returns the first step's
+    contradictions as (step, facts), or None if the KB stayed sound. A
+    DomainKB that raises Contradiction is reported as (step, [message]).
+    """
+    random.seed(seed)
+    env = Environment(size=size, num_wumpus=num_wumpus, pit_prob=pit_prob)
+    player = AGENTS[agent](env)
+    for step in range(max_steps):
+        if player.done:
+            break
+        try:
+            player.perceive(env.get_percepts(player.position, bump=getattr(player, "bump", False)))
+        except Contradiction as error:
+            return step, [str(error)]
+        wrong = contradictions(player.kb, env)
+        if wrong:
+            return step, wrong
+        env.apply_action(player, player.choose_action())
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that an agent's KB never contradicts the hidden world")
+    parser.add_argument("--episodes", type=int, default=300)
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="kb-domains")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--wumpus", type=int, default=1)
+    parser.add_argument("--pit-prob", type=float, default=0.2)
+    parser.add_argument("--max-steps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    unsound = 0
+    for seed in range(args.seed, args.seed + args.episodes):
+        found = check_episode(seed, args.agent, args.size, args.wumpus, args.pit_prob, args.max_steps)
+        if found is not None:
+            unsound += 1
+            step, wrong = found
+            print(f"seed {seed} step {step}: {sorted(wrong)}")
+    print(f"{unsound} of {args.episodes} episodes contradicted the world")
+    raise SystemExit(1 if unsound else 0)
+
+
+if __name__ == "__main__":
+    main()
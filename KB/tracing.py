@@ -0,0 +1,31 @@
+QUIET = 0
+INFO = 1
+DEBUG = 2
+
+
+class Trace:
+    """
+    Leveled message sink shared by the environment, the agents and the runners.
+
+    Messages use %-style arguments and are only formatted when their level is
+    enabled, so a QUIET trace costs one comparison per call. `sink` receives
+    the finished string (print by default, list.append to capture a run).
+    """
+
+    def __init__(self, level=INFO, sink=print):
+        self.level = level
+        self.sink = sink
+
+    def enabled(self, level):
+        return self.level >= level
+
+    def info(self, msg, *args):
+        if self.level >= INFO:
+            self.sink(msg % args if args else msg)
+
+    def debug(self, msg, *args):
+        if self.level >= DEBUG:
+            self.sink(msg % args if args else msg)
+
+
+NULL_TRACE = Trace(QUIET)
@@ -0,0 +1,160 @@
+import numpy as np
+
+from environment import (
+    ACTION_CODES, CELL_GOLD, CELL_PERCEPTS, CELL_PIT, CELL_STENCH, CELL_WUMPUS,
+    PERCEPT_BUMP, PERCEPT_SCREAM,
+)
+from wumpus_core.engine import HEADING_DELTAS
+
+MOVE = ACTION_CODES["move"]
+TURN_LEFT = ACTION_CODES["turn_left"]
+TURN_RIGHT = ACTION_CODES["turn_right"]
+SHOOT = ACTION_CODES["shoot"]
+GRAB = ACTION_CODES["grab"]
+CLIMB = ACTION_CODES["climb"]
+
+# Heading indices follow HEADINGS ("NESW")
+DX, DY = np.array(HEADING_DELTAS, dtype=np.int64).T
+EAST = 1
+
+# Values of VectorEnvironment.death
+ALIVE, DIED_IN_PIT, EATEN_BY_WUMPUS = 0, 1, 2
+
+
+class VectorEnvironment:
+    """
+    B worlds advanced in lockstep with the scoring of Environment.apply_action.
+
+    `worlds` is a (B, size, size) uint8 stack of CELL_* flags such as
+    worldgen.generate_worlds() returns; it is used in place, so grabbed gold
+    and killed Wumpus show up in the caller's array. Agents start at (0, 0)
+    facing east with one arrow. Actions are ACTION_CODES; a world that is done
+    ignores further actions and earns 0.
+    """
+
+    def __init__(self, worlds):
+        if worlds.dtype != np.uint8 or worlds.ndim != 3 or worlds.shape[1] != worlds.shape[2]:
+            raise ValueError("worlds must be a (B, size, size) uint8 array")
+        self.worlds = worlds
+        self.num_envs = worlds.shape[0]
+        self.size = worlds.shape[1]
+        self.cells = worlds.reshape(self.num_envs, self.size * self.size)
+        if not np.shares_memory(self.cells, worlds):
+            raise ValueError("worlds must be C-contiguous so it can be stepped in place")
+        self._rows = np.arange(self.num_envs)
+        self.reset()
+
+    def reset(self):
+        n = self.num_envs
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.heading = np.full(n, EAST, dtype=np.int64)
+        self.arrow_used = np.zeros(n, dtype=bool)
+        self.has_gold = np.zeros(n, dtype=bool)
+        self.done = np.zeros(n, dtype=bool)
+        self.scream = np.zeros(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.death = np.zeros(n, dtype=np.uint8)
+        return self.percepts()
+
+    def percepts(self, bump=None):
+        """PERCEPT_* bitmask per world for the agent's current cell."""
+        bits = self.cells[self._rows, self.x * self.size + self.y] & CELL_PERCEPTS
+        bits = bits | np.where(self.scream, PERCEPT_SCREAM, 0).astype(np.uint8)
+        if bump is not None:
+            bits |= np.where(bump, PERCEPT_BUMP, 0).astype(np.uint8)
+        return bits
+
+    def step(self, actions):
+        """Apply one action per world; returns (percepts, rewards, done)."""
+        actions = np.asarray(actions)
+        size, cells = self.size, self.cells
+        live = ~self.done
+        rewards = np.zeros(self.num_envs, dtype=np.int64)
+        bump = np.zeros(self.num_envs, dtype=bool)
+        self.scream[:] = False
+        here = self.x * size + self.y
+
+        grab = live & (actions == GRAB)
+        grab &= (cells[self._rows, here] & CELL_GOLD) != 0
+        cells[self._rows[grab], here[grab]] &= ~CELL_GOLD & 0xFF
+        rewards[grab] += 10
+        self.has_gold |= grab
+
+        climb = live & (actions == CLIMB) & (self.x == 0) & (self.y == 0)
+        rewards[climb & self.has_gold] += 1000
+        self.done |= climb
+
+        turn_left = live & (actions == TURN_LEFT)
+        turn_right = live & (actions == TURN_RIGHT)
+        self.heading[turn_left] = (self.heading[turn_left] - 1) % 4
+        self.heading[turn_right] = (self.heading[turn_right] + 1) % 4
+        rewards[turn_left | turn_right] -= 1
+
+        move = live & (actions == MOVE)
+        rewards[move] -= 1
+        nx = self.x + DX[self.heading]
+        ny = self.y + DY[self.heading]
+        inside = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+        bump |= move & ~inside
+        moved = move & inside
+        self.x[moved] = nx[moved]
+        self.y[moved] = ny[moved]
+        landed = cells[self._rows[moved], self.x[moved] * size + self.y[moved]]
+        pit = np.zeros(self.num_envs, dtype=bool)
+        wumpus = np.zeros(self.num_envs, dtype=bool)
+        pit[moved] = (landed & CELL_PIT) != 0
+        wumpus[moved] = (landed & CELL_WUMPUS) != 0
+        dead = pit | wumpus
+        rewards[dead] -= 1000
+        self.done |= dead
+        self.death[wumpus] = EATEN_BY_WUMPUS
+        self.death[pit] = DIED_IN_PIT
+
+        shoot = live & (actions == SHOOT)
+        rewards[shoot] -= 10
+        fire = shoot & ~self.arrow_used
+        self.arrow_used |= fire
+        if fire.any():
+            self._resolve_shots(np.flatnonzero(fire))
+
+        self.score += rewards
+        return self.percepts(bump), rewards, self.done.copy()
+
+    def _resolve_shots(self, shooters):
+        size, cells = self.size, self.cells
+        dx, dy = DX[self.heading[shooters]], DY[self.heading[shooters]]
+        steps = np.arange(1, size)
+        # Every cell along each arrow's line, masked to the grid
+        tx = self.x[shooters, None] + dx[:, None] * steps
+        ty = self.y[shooters, None] + dy[:, None] * steps
+        inside = (tx >= 0) & (tx < size) & (ty >= 0) & (ty < size)
+        flat = np.where(inside, tx * size + ty, 0)
+        hit = inside & ((cells[shooters[:, None], flat] & CELL_WUMPUS) != 0)
+        killed = hit.any(axis=1)
+        if not killed.any():
+            return
+        first = hit.argmax(axis=1)[killed]
+        worlds = shooters[killed]
+        kx = tx[killed, first]
+        ky = ty[killed, first]
+        cells[worlds, kx * size + ky] &= ~CELL_WUMPUS & 0xFF
+        self.scream[worlds] = True
+        self._refresh_stench(worlds, kx, ky)
+
+    def _refresh_stench(self, worlds, kx, ky):
+        # Only the neighbours of a killed Wumpus can lose their stench
+        size, cells = self.size, self.cells
+        for i in range(4):
+            nx, ny = kx + DX[i], ky + DY[i]
+            inside = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+            w, nx, ny = worlds[inside], nx[inside], ny[inside]
+            smelly = np.zeros(len(w), dtype=bool)
+            for j in range(4):
+                mx, my = nx + DX[j], ny + DY[j]
+                ok = (mx >= 0) & (mx < size) & (my >= 0) & (my < size)
+                flat = np.where(ok, mx * size + my, 0)
+                smelly |= ok & ((cells[w, flat] & CELL_WUMPUS) != 0)
+            flat = nx * size + ny
+            cells[w, flat] = np.where(smelly, cells[w, flat] | CELL_STENCH,
+                                      cells[w, flat] & (~CELL_STENCH & 0xFF))
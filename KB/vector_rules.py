@@ -0,0 +1,56 @@
+from bitboard import board
+from knowledge_base import NEIGHBOURS, vectorized
+
+# Grid size from which KBWumpusAgent switches to the whole-grid rule backend
+VECTORIZE_MIN_SIZE = 64
+
+
+@vectorized
+def vector_breeze_rule(facts, size):
+    """Same conclusions as breeze_rule, computed with shifts over the fact bitsets."""
+    bb = board(size)
+    breeze = facts.mask("breeze")
+    no_breeze = facts.mask("no_breeze")
+    candidates = facts.mask("no_pit") & ~facts.mask("possible_wumpus") & ~facts.mask("wumpus")
+
+    possible_pit = 0
+    at_least_one = at_least_two = 0
+    facing = []
+    for dx, dy in NEIGHBOURS:
+        # Breeze cells whose (dx, dy) neighbour is still a pit candidate
+        hit = bb.shift(candidates, -dx, -dy) & breeze
+        facing.append(hit)
+        possible_pit |= bb.shift(hit, dx, dy)
+        at_least_two |= at_least_one & hit
+        at_least_one |= hit
+
+    # A breeze with a single candidate neighbour pins the pit there
+    single = at_least_one & ~at_least_two
+    pit = 0
+    for (dx, dy), hit in zip(NEIGHBOURS, facing):
+        pit |= bb.shift(hit & single, dx, dy)
+
+    around_no_breeze = bb.neighbours(no_breeze)
+    return {
+        "possible_pit": possible_pit,
+        "pit": pit,
+        "no_pit": around_no_breeze,
+        "safe": around_no_breeze,
+    }
+
+
+@vectorized
+def vector_stench_rule(facts, size):
+    """Same conclusions as stench_rule, computed with shifts over the fact bitsets."""
+    bb = board(size)
+    no_pit = facts.mask("no_pit")
+    around_stench = bb.neighbours(facts.mask("stench"))
+    around_no_stench = bb.neighbours(facts.mask("no_stench"))
+    return {
+        "possible_wumpus": around_stench & no_pit & ~facts.mask("wumpus"),
+        "no_wumpus": around_no_stench,
+        "safe": around_no_stench & no_pit,
+    }
+
+
+VECTOR_RULES = (vector_breeze_rule, vector_stench_rule)
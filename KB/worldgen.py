@@ -0,0 +1,68 @@
+import numpy as np
+
+from environment import (
+    Environment, CELL_BREEZE, CELL_GOLD, CELL_PIT, CELL_STENCH, CELL_WUMPUS,
+)
+
+
+def generate_worlds(count, size=4, num_wumpus=2, pit_prob=0.2, seed=None):
+    """
+    Generate `count` worlds at once with NumPy's RNG.
+
+    Returns a C-contiguous uint8 array of shape (count, size, size) holding the
+    same CELL_* flags as Environment.cells, indexed [world, x, y], with the
+    stench and breeze maps already filled in. Placement follows Environment:
+    up to num_wumpus distinct Wumpus cells, then a pit with probability
+    pit_prob on every other cell, then gold on a free cell - never at (0, 0).
+    A world with no free cell left gets no gold. The same seed always
+    produces the same stack.
+    """
+    rng = np.random.default_rng(seed)
+    cells = size * size
+    worlds = np.zeros((count, cells), dtype=np.uint8)
+    if cells < 2:
+        return worlds.reshape(count, size, size)
+
+    # Distinct Wumpus cells: the num_wumpus smallest of one random key per non-origin cell
+    k = min(num_wumpus, cells - 1)
+    if k > 0:
+        keys = rng.random((count, cells - 1))
+        picks = np.argpartition(keys, k - 1, axis=1)[:, :k] + 1
+        np.put_along_axis(worlds, picks, CELL_WUMPUS, axis=1)
+
+    free = np.ones((count, cells), dtype=bool)
+    free[:, 0] = False
+    free &= worlds == 0
+    pits = free & (rng.random((count, cells)) < pit_prob)
+    worlds[pits] |= CELL_PIT
+
+    # Gold: uniform over the cells still free, via the smallest random key
+    free &= ~pits
+    keys = rng.random((count, cells))
+    keys[~free] = 2.0
+    gold = keys.argmin(axis=1)
+    has_gold = free[np.arange(count), gold]
+    worlds[np.arange(count)[has_gold], gold[has_gold]] |= CELL_GOLD
+
+    worlds = worlds.reshape(count, size, size)
+    add_warnings(worlds)
+    return worlds
+
+
+def add_warnings(worlds):
+    """Set the stench/breeze flags of a (count, size, size) stack from its Wumpus/pit flags, in place."""
+    for hazard, warning in ((CELL_WUMPUS, CELL_STENCH), (CELL_PIT, CELL_BREEZE)):
+        present = (worlds & hazard) != 0
+        near = np.zeros_like(present)
+        near[:, 1:, :] |= present[:, :-1, :]
+        near[:, :-1, :] |= present[:, 1:, :]
+        near[:, :, 1:] |= present[:, :, :-1]
+        near[:, :, :-1] |= present[:, :, 1:]
+        worlds[near] |= warning
+    return worlds
+
+
+def environments(worlds, num_wumpus=None, pit_prob=None, trace=None):
+    """Yield an Environment per world of the stack, each sharing its memory."""
+    for world in worlds:
+        yield Environment.from_cells(world, num_wumpus=num_wumpus, pit_prob=pit_prob, trace=trace)
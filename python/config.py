@@ -8,6 +8,7 @@ PIT_PROB = 0.2  # Probability of a pit in each cell
 NUM_WUMPUS = 2  # Number of Wumpus
 START_POS = (0, 0)  # Starting position of the player
 START_FACING = "right"  # Starting direction of the player
+WUMPUS_MOVE_INTERVAL = 5  # Wumpus move after every this many actions (advanced setting)
 
 # Scoring rules
 ACTION_COST = -1  # Cost for move, turn, grab, climb
@@ -1,34 +1,89 @@
+import os
 import random
-from typing import List, Tuple, Set
+import sys
+from typing import Dict, List, Optional, Tuple, Set
 from config import (
     GRID_SIZE, PIT_PROB, NUM_WUMPUS, START_POS, START_FACING,
-    ACTION_COST, SHOOT_COST, GOLD_REWARD, DEATH_PENALTY, WARNING_TYPES, GAME_OBJECTS
+    ACTION_COST, SHOOT_COST, GOLD_REWARD, DEATH_PENALTY, WARNING_TYPES, GAME_OBJECTS,
+    WUMPUS_MOVE_INTERVAL
 )
 
-git
+# wumpus_core/ at the repository root is shared with the KB/ engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wumpus_core.engine import (
+    WorldCore, CELL_GOLD, CELL_HAZARDS, PERCEPT_STENCH, PERCEPT_BREEZE, PERCEPT_GLITTER,
+    PERCEPT_BUMP, PERCEPT_SCREAM
+)
+
+# Index into wumpus_core HEADINGS ("NESW") for each facing
+FACING_HEADINGS = {"up": 0, "right": 1, "down": 2, "left": 3}
+
+
 class Position:
+    """
+    Immutable grid cell. The cells of the current board are interned -
+    Position(x, y) returns the same object for the same cell - and each one
+    caches its neighbours, so moving, turning and sensing never allocate new
+    positions. Cells off the board are built fresh; they still compare and
+    hash by value.
+    """
+
+    __slots__ = ("x", "y", "_hash", "_adjacent", "_forward")
+    # Only ever the cells of one board (see intern_board), so it does not grow
+    # with every world size played
+    _interned: Dict[Tuple[int, int], 'Position'] = {}
+
+    def __new__(cls, x: int, y: int):
+        pos = cls._interned.get((x, y))
+        if pos is None:
+            pos = object.__new__(cls)
+            object.__setattr__(pos, "x", x)
+            object.__setattr__(pos, "y", y)
+            object.__setattr__(pos, "_hash", hash((x, y)))
+            object.__setattr__(pos, "_adjacent", None)
+            object.__setattr__(pos, "_forward", None)
+        return pos
+
+    @classmethod
+    def intern_board(cls, size: int) -> None:
+        """Intern the cells of a size x size board in place of the previous board's."""
+        if len(cls._interned) == size * size and (size - 1, size - 1) in cls._interned:
+            return
+        cls._interned = {}
+        cls._interned = {(x, y): cls(x, y) for x in range(size) for y in range(size)}
 
-    def __init__(self, x: int, y: int):
-        self.x = x
-        self.y = y
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __reduce__(self):
+        return Position, (self.x, self.y)
 
     def __eq__(self, other):
-        return isinstance(other, Position) and self.x == other.x and self.y == other.y
+        return self is other or (isinstance(other, Position) and self.x == other.x and self.y == other.y)
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        return self._hash
 
     def __repr__(self):
         return f"({self.x}, {self.y})"
 
-    def adjacent_cells(self) -> List['Position']:
-        """Return a list of adjacent cells (north, south, east, west)."""
-        return [
-            Position(self.x, self.y + 1),  # North
-            Position(self.x, self.y - 1),  # South
-            Position(self.x + 1, self.y),  # East
-            Position(self.x - 1, self.y)  # West
-        ]
+    def adjacent_cells(self) -> Tuple['Position', ...]:
+        """Return the adjacent cells (north, south, east, west)."""
+        if self._adjacent is None:
+            object.__setattr__(self, "_adjacent", (
+                Position(self.x, self.y + 1),  # North
+                Position(self.x, self.y - 1),  # South
+                Position(self.x + 1, self.y),  # East
+                Position(self.x - 1, self.y)  # West
+            ))
+        return self._adjacent
+
+    def forward(self, facing: str) -> 'Position':
+        """The neighbouring cell in a facing direction ('up', 'down', 'left' or 'right')."""
+        if self._forward is None:
+            north, south, east, west = self.adjacent_cells()
+            object.__setattr__(self, "_forward", {"up": north, "down": south, "right": east, "left": west})
+        return self._forward.get(facing)
 
 
 class Entity:
@@ -92,6 +147,7 @@ class Player(Entity):
         self.state = 'idle'
         if world.is_gold(self.pos):
             world.gold.is_taken = True
+            world.core.set_flag(self.pos.x, self.pos.y, CELL_GOLD, False)
             self.has_gold = True
             self.score += GOLD_REWARD
             return "Success: Grabbed the gold!"
@@ -106,15 +162,12 @@ class Player(Entity):
             self.state = 'idle'
             return "Warning: No arrows left!"
         self.has_arrow = False
-        path = self._get_shooting_path(world)
-        for pos in path:
-            for wumpus in world.wumpus:
-                if wumpus.pos == pos and wumpus.is_alive:
-                    wumpus.is_alive = False
-                    wumpus.state = 'dead'
-                    self.state = 'idle'
-                    return "Scream: Wumpus killed!"
+        hit = world.core.first_wumpus(self.pos.x, self.pos.y, FACING_HEADINGS[self.facing],
+                                      include_start=True)
         self.state = 'idle'
+        if hit is not None:
+            world.kill_wumpus(world.wumpus_at[Position(*hit)])
+            return "Scream: Wumpus killed!"
         return "Warning: Arrow missed!"
 
     def climb(self, world: 'WumpusWorld') -> Tuple[bool, str]:
@@ -122,36 +175,13 @@ class Player(Entity):
         self.action_count += 1
         self.score += ACTION_COST
         self.state = 'idle'
-        if self.pos == Position(0, 0) and self.has_gold:
+        if self.pos == world.exit and self.has_gold:
             return True, "Winner: Escaped with the gold!"
         return False, "Warning: Cannot climb out yet!"
 
     def _get_forward_position(self) -> Position:
         """Calculate the position in front based on facing direction."""
-        if self.facing == "up":
-            return Position(self.pos.x, self.pos.y + 1)
-        elif self.facing == "down":
-            return Position(self.pos.x, self.pos.y - 1)
-        elif self.facing == "right":
-            return Position(self.pos.x + 1, self.pos.y)
-        elif self.facing == "left":
-            return Position(self.pos.x - 1, self.pos.y)
-
-    def _get_shooting_path(self, world: 'WumpusWorld') -> List[Position]:
-        """Calculate the path of the arrow based on facing direction."""
-        path = []
-        current = self.pos
-        while world.in_bounds(current) and not world.is_wall(current):
-            path.append(current)
-            if self.facing == "up":
-                current = Position(current.x, current.y + 1)
-            elif self.facing == "down":
-                current = Position(current.x, current.y - 1)
-            elif self.facing == "right":
-                current = Position(current.x + 1, current.y)
-            elif self.facing == "left":
-                current = Position(current.x - 1, current.y)
-        return path
+        return self.pos.forward(self.facing)
 
 
 class Wumpus(Entity):
@@ -162,22 +192,19 @@ class Wumpus(Entity):
         self.is_alive = True
         self.state = 'idle'  # idle or dead
 
+    def choose_move(self, world: 'WumpusWorld') -> Optional[Position]:
+        """A random adjacent cell free of pits and Wumpus, or None if boxed in."""
+        if not self.is_alive:
+            return None
+        cells, size = world.core.cells, world.size
+        valid_moves = [pos for pos in world.neighbours[self.pos] if not cells[pos.x * size + pos.y] & CELL_HAZARDS]
+        return random.choice(valid_moves) if valid_moves else None
+
     def move(self, world: 'WumpusWorld'):
         """Move to a random adjacent cell if possible (advanced setting)."""
-        if not self.is_alive:
-            return
-        valid_moves = [
-            pos for pos in self.pos.adjacent_cells()
-            if (world.in_bounds(pos) and not world.is_wall(pos) and
-                not world.is_pit(pos) and not any(w.pos == pos for w in world.wumpus if w.is_alive))
-        ]
-        if valid_moves:
-            new_pos = random.choice(valid_moves)
-            if world.player.pos == new_pos:
-                world.player.is_alive = False
-                world.player.score += DEATH_PENALTY
-            else:
-                self.move_to(new_pos)
+        new_pos = self.choose_move(world)
+        if new_pos is not None:
+            world.apply_wumpus_move(self, new_pos)
 
 
 class Pit(Entity):
@@ -206,19 +233,20 @@ class WumpusWorld:
         self.wumpus = []
         self.pits = []
         self.gold = None
+        Position.intern_board(size)
         self.exit = Position(0, 0)  # Exit position
-        self.walls = self._generate_walls()
-
-    def _generate_walls(self) -> Set[Position]:
-        """Generate walls surrounding the grid."""
-        walls = set()
-        for x in range(-1, self.size + 1):
-            walls.add(Position(x, -1))
-            walls.add(Position(x, self.size))
-        for y in range(self.size):
-            walls.add(Position(-1, y))
-            walls.add(Position(self.size, y))
-        return walls
+        # In-bounds neighbours of every cell
+        self.neighbours: Dict[Position, Tuple[Position, ...]] = {
+            Position(x, y): tuple(cell for cell in Position(x, y).adjacent_cells() if self.in_bounds(cell))
+            for x in range(size) for y in range(size)
+        }
+        # Flag grid (hazards, warnings, gold) and entity indexes, kept in step
+        # with self.pits / self.wumpus / self.gold
+        self.core = WorldCore(size)
+        self.pit_cells: Set[Position] = set()
+        self.wumpus_at: Dict[Position, 'Wumpus'] = {}
+        self.dead_wumpus = 0
+        self.rebuild_indexes()
 
     def initialize(self):
         """Randomly initialize the environment."""
@@ -242,15 +270,57 @@ class WumpusWorld:
             Pit(pos) for pos in available_cells
             if random.random() < self.pit_prob
         ]
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        """Recompute the flag grid and entity indexes from self.pits, self.wumpus and self.gold."""
+        self.pit_cells = {pit.pos for pit in self.pits}
+        self.wumpus_at = {w.pos: w for w in self.wumpus if w.is_alive}
+        self.dead_wumpus = sum(1 for w in self.wumpus if not w.is_alive)
+        self.core.clear()
+        for pos in self.pit_cells:
+            self.core.set_pit(pos.x, pos.y)
+        for pos in self.wumpus_at:
+            self.core.set_wumpus(pos.x, pos.y)
+        if self.gold is not None and not self.gold.is_taken:
+            self.core.set_flag(self.gold.pos.x, self.gold.pos.y, CELL_GOLD)
+
+    def move_wumpus(self, wumpus: 'Wumpus', new_pos: Position):
+        """Move a live Wumpus, keeping the flag grid and Wumpus index current."""
+        old_pos = wumpus.pos
+        del self.wumpus_at[old_pos]
+        wumpus.move_to(new_pos)
+        self.wumpus_at[new_pos] = wumpus
+        self.core.move_wumpus(old_pos.x, old_pos.y, new_pos.x, new_pos.y)
+
+    def apply_wumpus_move(self, wumpus: 'Wumpus', new_pos: Position):
+        """Carry out a chosen Wumpus move; stepping onto the player kills them and the Wumpus stays."""
+        if self.player.pos == new_pos:
+            self.player.is_alive = False
+            self.player.score += DEATH_PENALTY
+        else:
+            self.move_wumpus(wumpus, new_pos)
+
+    def kill_wumpus(self, wumpus: 'Wumpus'):
+        """Mark a Wumpus dead and drop it from the flag grid and Wumpus index."""
+        if not wumpus.is_alive:
+            return
+        wumpus.is_alive = False
+        wumpus.state = 'dead'
+        del self.wumpus_at[wumpus.pos]
+        self.core.set_wumpus(wumpus.pos.x, wumpus.pos.y, False)
+        self.dead_wumpus += 1
 
     def is_wall(self, pos: Position) -> bool:
-        return pos in self.walls
+        """Walls form the ring of cells just outside the grid."""
+        return (-1 <= pos.x <= self.size and -1 <= pos.y <= self.size
+                and not (0 <= pos.x < self.size and 0 <= pos.y < self.size))
 
     def is_pit(self, pos: Position) -> bool:
-        return any(pit.pos == pos for pit in self.pits)
+        return pos in self.pit_cells
 
     def is_wumpus(self, pos: Position) -> bool:
-        return any(w.pos == pos and w.is_alive for w in self.wumpus)
+        return pos in self.wumpus_at
 
     def is_gold(self, pos: Position) -> bool:
         return self.gold and self.gold.pos == pos and not self.gold.is_taken
@@ -261,15 +331,22 @@ class WumpusWorld:
     def in_bounds(self, pos: Position) -> bool:
         return 0 <= pos.x < self.size and 0 <= pos.y < self.size
 
+    def percept_bits(self) -> int:
+        """The player's percepts as a wumpus_core PERCEPT_* bitmask."""
+        pos = self.player.pos
+        ahead = self.player._get_forward_position()
+        bump = not self.in_bounds(ahead) or self.is_wall(ahead)
+        return self.core.sense(pos.x, pos.y, bump, self.dead_wumpus > 0)
+
     def get_percepts(self) -> List[str]:
         """Return percepts as a list of warning types."""
         percepts = []
-        stench = any(w.pos in self.player.pos.adjacent_cells() and w.is_alive for w in self.wumpus)
-        breeze = any(pit.pos in self.player.pos.adjacent_cells() for pit in self.pits)
-        glitter = self.is_gold(self.player.pos)
-        bump = not self.in_bounds(self.player._get_forward_position()) or self.is_wall(
-            self.player._get_forward_position())
-        scream = any(not w.is_alive for w in self.wumpus)
+        bits = self.percept_bits()
+        stench = bits & PERCEPT_STENCH
+        breeze = bits & PERCEPT_BREEZE
+        glitter = bits & PERCEPT_GLITTER
+        bump = bits & PERCEPT_BUMP
+        scream = bits & PERCEPT_SCREAM
 
         if stench and breeze:
             percepts.append(WARNING_TYPES['BREEZE_STENCH'])
@@ -287,10 +364,28 @@ class WumpusWorld:
         return percepts
 
     def update_wumpus_movement(self):
-        """Move each Wumpus after every 5 actions (advanced setting)."""
-        if self.player.action_count % 5 == 0:
-            for wumpus in self.wumpus:
-                wumpus.move(self)
+        """Move the Wumpus after every WUMPUS_MOVE_INTERVAL actions (advanced setting)."""
+        if self.player.action_count % WUMPUS_MOVE_INTERVAL == 0:
+            self.move_all_wumpus()
+
+    def move_all_wumpus(self):
+        """
+        Move every live Wumpus in one pass. Each one picks a free neighbour in
+        the flag grid as it stood before the pass, so the outcome does not
+        depend on the order of self.wumpus except for conflicts: when several
+        pick the same cell the first one gets it and the others stay put. Only
+        the stench flags around Wumpus that actually moved are touched.
+        """
+        claimed = set()
+        moves = []
+        for wumpus in self.wumpus:
+            new_pos = wumpus.choose_move(self)
+            if new_pos is not None and new_pos not in claimed:
+                claimed.add(new_pos)
+                moves.append((wumpus, new_pos))
+        # Targets were free before the pass and are distinct, so moves cannot collide
+        for wumpus, new_pos in moves:
+            self.apply_wumpus_move(wumpus, new_pos)
 
     def check_collisions(self) -> str:
         """Check if player hits a Wumpus or pit."""
@@ -0,0 +1 @@
+"""Pieces shared by the KB/ and python/ world engines."""
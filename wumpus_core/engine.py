@@ -0,0 +1,130 @@
+"""
+World core shared by the KB/ Environment and the python/ WumpusWorld.
+
+The world is one byte of CELL_* flags per cell at index x * size + y.
+Breeze and stench are kept up to date whenever a pit or Wumpus changes, so
+what an agent senses in a cell is a single byte read, returned as a
+PERCEPT_* bitmask. The front-ends keep their own agent state and scoring
+and use WorldCore for everything that touches the grid.
+"""
+from .shots import first_hit
+
+# Compact codes shared by traces and array-based engines
+ACTIONS = ("move", "turn_left", "turn_right", "shoot", "grab", "climb", "wait")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+HEADINGS = "NESW"
+HEADING_DELTAS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+PERCEPT_STENCH = 1
+PERCEPT_BREEZE = 2
+PERCEPT_GLITTER = 4
+PERCEPT_BUMP = 8
+PERCEPT_SCREAM = 16
+PERCEPT_BITS = {
+    "stench": PERCEPT_STENCH,
+    "breeze": PERCEPT_BREEZE,
+    "glitter": PERCEPT_GLITTER,
+    "bump": PERCEPT_BUMP,
+    "scream": PERCEPT_SCREAM,
+}
+
+
+def encode_percepts(percepts):
+    """Pack a {name: bool} percept dict into a PERCEPT_* bitmask."""
+    bits = 0
+    for name, bit in PERCEPT_BITS.items():
+        if percepts.get(name, False):
+            bits |= bit
+    return bits
+
+
+def decode_percepts(bits):
+    return {name: bool(bits & bit) for name, bit in PERCEPT_BITS.items()}
+
+
+# Per-cell flags of the world grid. The percept bits line up with PERCEPT_*,
+# so the stench/breeze/glitter part of a percept is just `flags & 7`.
+CELL_STENCH = PERCEPT_STENCH
+CELL_BREEZE = PERCEPT_BREEZE
+CELL_GOLD = PERCEPT_GLITTER
+CELL_PIT = 8
+CELL_WUMPUS = 16
+CELL_WALL = 32
+CELL_PERCEPTS = CELL_STENCH | CELL_BREEZE | CELL_GOLD
+CELL_HAZARDS = CELL_PIT | CELL_WUMPUS
+
+NEIGHBOURS = ((0, 1), (1, 0), (-1, 0), (0, -1))
+
+
+class WorldCore:
+    """Flag grid with incremental warnings, shot resolution and bitmask percepts."""
+
+    def __init__(self, size, cells=None):
+        self.size = size
+        self.cells = bytearray(size * size) if cells is None else cells
+
+    def clear(self):
+        self.cells[:] = bytes(len(self.cells))
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    def flags(self, x, y):
+        return self.cells[x * self.size + y]
+
+    def set_flag(self, x, y, flag, value=True):
+        i = x * self.size + y
+        if value:
+            self.cells[i] |= flag
+        else:
+            self.cells[i] &= ~flag & 0xFF
+
+    def set_pit(self, x, y, value=True):
+        self._set_hazard(x, y, CELL_PIT, CELL_BREEZE, value)
+
+    def set_wumpus(self, x, y, value=True):
+        self._set_hazard(x, y, CELL_WUMPUS, CELL_STENCH, value)
+
+    def move_wumpus(self, x, y, nx, ny):
+        self.set_wumpus(x, y, False)
+        self.set_wumpus(nx, ny)
+
+    def is_free(self, x, y):
+        """No pit and no live Wumpus in the cell."""
+        return not self.cells[x * self.size + y] & CELL_HAZARDS
+
+    def _set_hazard(self, x, y, hazard, warning, value):
+        size, cells = self.size, self.cells
+        if bool(cells[x * size + y] & hazard) == bool(value):
+            return
+        self.set_flag(x, y, hazard, value)
+        # Only the four neighbours can change their warning
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size:
+                if value:
+                    cells[nx * size + ny] |= warning
+                else:
+                    self.set_flag(nx, ny, warning, self._hazard_around(nx, ny, hazard))
+
+    def _hazard_around(self, x, y, hazard):
+        size, cells = self.size, self.cells
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size and cells[nx * size + ny] & hazard:
+                return True
+        return False
+
+    def first_wumpus(self, x, y, heading, include_start=False):
+        """Cell of the first live Wumpus from (x, y) along HEADINGS[heading], or None."""
+        dx, dy = HEADING_DELTAS[heading]
+        return first_hit(self.cells, self.size, x, y, dx, dy, CELL_WUMPUS, include_start)
+
+    def sense(self, x, y, bump=False, scream=False):
+        """PERCEPT_* bitmask for an agent standing on (x, y)."""
+        bits = self.cells[x * self.size + y] & CELL_PERCEPTS
+        if bump:
+            bits |= PERCEPT_BUMP
+        if scream:
+            bits |= PERCEPT_SCREAM
+        return bits
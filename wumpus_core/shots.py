@@ -0,0 +1,35 @@
+"""
+Arrow resolution on a flat occupancy grid.
+
+Both engines keep one byte of flags per cell at index x * size + y, so a
+column is a contiguous slice of the grid and a row is a strided one. A shot
+turns the line it flies along into 0/1 bytes with one translate() and finds
+the first hit with find()/rfind(), all in C, whatever the number of Wumpus.
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _hit_table(flag):
+    # Maps every flag byte to 1 if it has `flag` set, else 0
+    return bytes(1 if value & flag else 0 for value in range(256))
+
+
+def first_hit(cells, size, x, y, dx, dy, flag, include_start=False):
+    """
+    First cell (x', y') from (x, y) along the unit step (dx, dy) whose flags
+    have `flag` set, or None. The start cell itself only counts when
+    include_start is true. `cells` is a bytearray, bytes or 1-D memoryview.
+    """
+    if dx == 0:
+        line, start, step = cells[x * size:(x + 1) * size], y, dy
+    else:
+        line, start, step = cells[y::size], x, dx
+    hits = bytes(line).translate(_hit_table(flag))
+    if step > 0:
+        i = hits.find(1, start if include_start else start + 1)
+    else:
+        i = hits.rfind(1, 0, start + 1 if include_start else start)
+    if i < 0:
+        return None
+    return (x, i) if dx == 0 else (i, y)